@@ -0,0 +1,151 @@
+"""
+原始 (描述器編譯前) 的逐欄位解析, 作為 bench_descriptors.py 的比較基準
+
+內容固定為描述器編譯前 protocols/descriptors.py 的解析方式 (每個欄位各自 struct.unpack_from、
+json.loads、不使用字串快取), 之後對描述器的最佳化不應修改此檔案, 否則量測出的加速比就沒有意義
+
+settle_resp 的下注詳情原本解析為 [{"playtype", "winlose"}, ...], 再由 recv_settle_resp 轉成 {playtype: winlose},
+基準包含這一步轉換, 與目前描述器直接解析出的 mapping 比較
+"""
+import json
+import struct
+
+
+class FieldDescriptor:
+    def __init__(self, name, size=None, field_type=None):
+        self.name = name
+        self.size = size
+        self.field_type = field_type
+
+
+class FixedField(FieldDescriptor):
+    def __init__(self, name, size, field_type, format_char):
+        super().__init__(name, size, field_type)
+        self.format_char = format_char
+
+    def parse(self, data, offset):
+        if offset + self.size > len(data):
+            raise ValueError(f"Data truncated for field {self.name}")
+
+        value = struct.unpack_from(f">{self.format_char}", data, offset)[0]
+
+        if self.format_char.endswith('s'):
+            value = value.decode("utf-8").strip("\x00")
+
+        return value, offset + self.size
+
+
+class StringField(FixedField):
+    def __init__(self, name, size):
+        super().__init__(name, size, "s", f"{size}s")
+
+
+class IntField(FixedField):
+    def __init__(self, name, size=4):
+        format_char = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}[size]
+        super().__init__(name, size, format_char, format_char)
+
+
+class FloatStringField(FixedField):
+    def __init__(self, name, size):
+        super().__init__(name, size, "s", f"{size}s")
+
+    def parse(self, data, offset):
+        string_value, next_offset = super().parse(data, offset)
+        try:
+            return float(string_value), next_offset
+        except ValueError:
+            return 0.0, next_offset
+
+
+class JsonField(FieldDescriptor):
+    def __init__(self, name):
+        super().__init__(name)
+
+    def parse(self, data, offset):
+        if offset >= len(data):
+            return {}, offset
+
+        try:
+            json_str = str(data[offset:], "utf-8").rstrip('\x00')
+            try:
+                return json.loads(json_str), len(data)
+            except json.JSONDecodeError:
+                return json_str, len(data)
+        except Exception:
+            return {}, len(data)
+
+
+class BettingDetailField(FieldDescriptor):
+    def __init__(self, name, count_field):
+        super().__init__(name)
+        self.count_field = count_field
+
+    def parse(self, data, offset, field_values):
+        count = field_values.get(self.count_field, 0)
+        results = []
+        current_offset = offset
+
+        for _ in range(count):
+            if current_offset + 31 > len(data):
+                break
+
+            playtype = struct.unpack_from(">B", data, current_offset)[0]
+            current_offset += 1
+
+            winlose_bytes = struct.unpack_from(">30s", data, current_offset)[0]
+            current_offset += 30
+            winlose_value = float(winlose_bytes.decode("utf-8").strip("\x00"))
+
+            results.append({"playtype": playtype, "winlose": winlose_value})
+
+        return results, current_offset
+
+
+class ProtocolDescriptor:
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def parse(self, data, offset=0):
+        result = {}
+
+        for field in self.fields:
+            if isinstance(field, BettingDetailField):
+                value, offset = field.parse(data, offset, result)
+            else:
+                value, offset = field.parse(data, offset)
+
+            result[field.name] = value
+
+        return result
+
+
+class SettleRespDescriptor(ProtocolDescriptor):
+    """原始解析加上 recv_settle_resp 將下注詳情轉成 {playtype: winlose} 的步驟"""
+
+    def parse(self, data, offset=0):
+        result = super().parse(data, offset)
+        order_detail = {}
+        for item in result.get("detail_items", []):
+            order_detail[item.get("playtype")] = item.get("winlose", 0.0)
+        result["detail_items"] = order_detail
+        return result
+
+
+BASELINE_DESCRIPTORS = {
+    "settle_resp": SettleRespDescriptor("settle_resp", [
+        StringField("vid", 4),
+        StringField("gmcode", 14),
+        IntField("seat", 4),
+        FloatStringField("res", 30),
+        IntField("count", 1),
+        BettingDetailField("detail_items", "count")
+    ]),
+
+    "game_result": ProtocolDescriptor("game_result", [
+        StringField("vid", 4),
+        StringField("gmtype", 4),
+        JsonField("json")
+    ]),
+}
@@ -0,0 +1,166 @@
+"""
+協議編解碼基準測試
+
+針對 protocols.PROTOCOLS 中的每一個協議離線產生合法的封包, 量測:
+- PacketHandler.pack_data / unpack_data 每秒次數 (ops/sec)
+- PROTOCOL_DESCRIPTORS 的解析 (settle_resp 1 ~ 14 筆下注詳情, game_result JSON)
+- PacketHandler.unpack_variable_data
+- 單次操作的記憶體配置峰值 (tracemalloc)
+
+結果寫成 JSON, 之後的執行可與基準檔比較, 低於門檻時以 exit code 1 結束
+
+執行方式:
+    python benchmarks/bench_codec.py --save-baseline            # 產生基準檔
+    python benchmarks/bench_codec.py                            # 與基準檔比較
+    python benchmarks/bench_codec.py --threshold 0.1 -k settle  # 只跑名稱包含 settle 的項目, 退步超過 10% 視為失敗
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+
+# 添加 src 到 Python 路徑
+benchmarks_path = Path(__file__).parent
+sys.path.insert(0, str(benchmarks_path.parent / "src"))
+
+from packet.packet_handler import PacketHandler
+from protocols.descriptors import PROTOCOL_DESCRIPTORS
+from protocols.protocols import PROTOCOLS
+
+from frames import build_body, build_frame, sample_fields
+
+DEFAULT_BASELINE = benchmarks_path / "baseline.json"
+MAX_DETAIL_COUNT = 14   # settle_resp 下注詳情筆數上限 (目前玩法組合最多 14 筆)
+
+
+def collect_cases(packet_handler):
+    """產生所有基準測試項目 {name: callable}"""
+    cases = {}
+
+    frame = build_frame(packet_handler, next(iter(PROTOCOLS)))
+    header = frame[:packet_handler.HEADER_SIZE]
+    cases["header/pack"] = lambda: packet_handler.pack_header(0x030001, 32, 0)
+    cases["header/unpack"] = lambda: packet_handler.unpack_header(header)
+
+    for protocol_name in PROTOCOLS:
+        values = sample_fields(protocol_name)
+        body = build_body(packet_handler, protocol_name)
+        cases[f"encode/{protocol_name}"] = lambda name=protocol_name, values=values: packet_handler.pack_data(name, **values)
+        cases[f"decode/{protocol_name}"] = lambda name=protocol_name, body=body: packet_handler.unpack_data(name, body)
+
+    if "table_status" in PROTOCOLS:
+        # wait_for_betting_phase 只訂閱 vid / status / gmcode
+        projection = packet_handler.CODECS["table_status"].projection(("vid", "status", "gmcode"))
+        if projection is not None:
+            body = build_body(packet_handler, "table_status")
+            cases["projection/table_status"] = lambda body=body: projection.decode(body)
+
+    if "settle_resp" in PROTOCOLS:
+        for count in range(1, MAX_DETAIL_COUNT + 1):
+            body = build_body(packet_handler, "settle_resp", detail_count=count)
+            cases[f"decode/settle_resp[{count}]"] = lambda body=body: packet_handler.unpack_data("settle_resp", body)
+            cases[f"unpack_variable_data[{count}]"] = (
+                lambda body=body, count=count: packet_handler.unpack_variable_data(body, count=count)
+            )
+
+    for protocol_name, descriptor in PROTOCOL_DESCRIPTORS.items():
+        if protocol_name not in PROTOCOLS:
+            continue
+        body = build_body(packet_handler, protocol_name, detail_count=MAX_DETAIL_COUNT)
+        cases[f"descriptor/{protocol_name}/parse"] = lambda descriptor=descriptor, body=body: descriptor.parse(body)
+        cases[f"descriptor/{protocol_name}/parse_fields"] = (
+            lambda descriptor=descriptor, body=body: descriptor.parse_fields(body)
+        )
+
+    return cases
+
+
+def measure(func, min_time):
+    """量測每秒次數與單次操作的記憶體配置峰值"""
+    # 先估算迴圈次數, 讓每次量測至少執行 min_time 秒
+    number, elapsed = timeit.Timer(func).autorange()
+    number = max(int(number * min_time / max(elapsed, 1e-9)), 1)
+    best = min(timeit.repeat(func, number=number, repeat=3))
+
+    tracemalloc.start()
+    func()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"ops_per_sec": number / best, "peak_bytes": peak - before}
+
+
+def compare(results, baseline, threshold):
+    """與基準檔比較, 返回退步超過門檻的項目"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        ratio = result["ops_per_sec"] / base["ops_per_sec"]
+        result["baseline_ratio"] = ratio
+        if ratio < 1 - threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="基準檔路徑")
+    parser.add_argument("--save-baseline", action="store_true", help="將本次結果寫入基準檔")
+    parser.add_argument("--output", type=Path, default=None, help="將本次結果另存為 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允許的退步比例, 預設 0.2 (20%%)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每個項目最少量測秒數")
+    parser.add_argument("-k", dest="keyword", default=None, help="只執行名稱包含此字串的項目")
+    args = parser.parse_args()
+
+    packet_handler = PacketHandler()
+    cases = collect_cases(packet_handler)
+    if args.keyword:
+        cases = {name: func for name, func in cases.items() if args.keyword in name}
+
+    results = {}
+    for name, func in cases.items():
+        results[name] = measure(func, args.min_time)
+
+    baseline = None
+    if not args.save_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+
+    print(f"{'case':<40}{'ops/sec':>14}{'peak bytes':>12}{'vs baseline':>13}")
+    for name, result in results.items():
+        ratio = result.get("baseline_ratio")
+        ratio_str = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"{name:<40}{result['ops_per_sec']:>14,.0f}{result['peak_bytes']:>12}{ratio_str:>13}")
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed more than {args.threshold:.0%}:")
+        for name, ratio in regressions:
+            print(f"  {name}: {ratio:.2f}x of baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
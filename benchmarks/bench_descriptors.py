@@ -0,0 +1,60 @@
+"""
+比較 settle_resp / game_result 原始逐欄位解析 (baseline_descriptors.py) 與編譯後解析 (parse) 的效能
+
+parse_fields 已經共用 bulk 解析、JSON backend 與字串快取, 只列出作為參考, 加速比以原始解析計算
+
+執行方式:
+    python benchmarks/bench_descriptors.py
+    python benchmarks/bench_descriptors.py --number 50000
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+# 添加 src 到 Python 路徑
+benchmarks_path = Path(__file__).parent
+sys.path.insert(0, str(benchmarks_path.parent / "src"))
+
+from protocols.descriptors import PROTOCOL_DESCRIPTORS
+
+from baseline_descriptors import BASELINE_DESCRIPTORS
+from frames import build_game_result_body, build_settle_resp_body
+
+# 玩法筆數對應目前測試案例: 單一玩法, 2/3 個玩法組合, 以及 10/12 個玩法全取
+SAMPLES = {
+    **{f"settle_resp[{count}]": ("settle_resp", build_settle_resp_body(count)) for count in (1, 2, 3, 10, 12)},
+    "game_result": ("game_result", build_game_result_body()),
+}
+
+
+def verify_samples():
+    """計時前確認各種解析方式的結果一致, 不一致時直接結束"""
+    for sample_name, (protocol_name, body) in SAMPLES.items():
+        descriptor = PROTOCOL_DESCRIPTORS[protocol_name]
+        expected = BASELINE_DESCRIPTORS[protocol_name].parse(body)
+        if descriptor.parse(body) != expected:
+            raise SystemExit(f"{sample_name}: parse() result differs from the baseline walk")
+        if descriptor.parse_fields(body) != expected:
+            raise SystemExit(f"{sample_name}: parse_fields() result differs from the baseline walk")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="每個樣本的解析次數")
+    args = parser.parse_args()
+
+    verify_samples()
+
+    print(f"{'sample':<18}{'baseline (us)':>16}{'parse_fields (us)':>20}{'parse (us)':>14}{'speedup':>10}")
+    for sample_name, (protocol_name, body) in SAMPLES.items():
+        baseline = BASELINE_DESCRIPTORS[protocol_name]
+        descriptor = PROTOCOL_DESCRIPTORS[protocol_name]
+        old = timeit.timeit(lambda: baseline.parse(body), number=args.number) / args.number * 1e6
+        fields = timeit.timeit(lambda: descriptor.parse_fields(body), number=args.number) / args.number * 1e6
+        new = timeit.timeit(lambda: descriptor.parse(body), number=args.number) / args.number * 1e6
+        print(f"{sample_name:<18}{old:>16.2f}{fields:>20.2f}{new:>14.2f}{old / new:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
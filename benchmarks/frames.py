@@ -0,0 +1,107 @@
+"""
+離線產生基準測試用的協議封包
+
+依照 protocols.PROTOCOLS 的欄位定義產生合法的協議本體, 不需要連線到 Gate Server
+"""
+import json
+import struct
+
+from protocols.protocols import HEADER_FORMAT, HEADER_SIZE, PROTOCOLS
+
+# 常見欄位使用接近實際的數值, 其餘欄位依型態產生
+SAMPLE_VALUES = {
+    "vid": "BC51",
+    "gmcode": "G2507290000001",
+    "gmtype": "bac",
+    "res": "-1250.50",
+}
+SAMPLE_INTS = {"B": 1, "H": 300, "I": 20250729, "Q": 1234567890123}
+
+# 開牌結果 JSON, 大小接近實際百家樂 game_result
+GAME_RESULT_JSON = {
+    "gmcode": "G2507290000001",
+    "res": 134217745,
+    # 實際的牌面為 {"rank": 1~13, "suit": 0~3} 物件 (見 game.card_parser.Card), 閒1、莊1、閒2、莊2、閒3、莊3
+    "cards": [
+        {"rank": 12, "suit": 0},
+        {"rank": 12, "suit": 1},
+        {"rank": 12, "suit": 2},
+        {"rank": 12, "suit": 3},
+        {"rank": 3, "suit": 0},
+        {"rank": 3, "suit": 1},
+    ],
+    "dragontype": 2,
+    "dragonodd": 4,
+    "duobaotype": 1,
+    "shoe": 12,
+    "round": 37,
+    "banker_point": 8,
+    "player_point": 3,
+    "roadmap": "BBPBTPPBBBPB" * 4,
+}
+
+
+# settle_resp 描述器的固定部分 (vid, gmcode, seat, res, count) 與每一筆下注詳情 (playtype, winlose)
+SETTLE_RESP_PREFIX_STRUCT = struct.Struct(">4s14sI30sB")
+SETTLE_DETAIL_STRUCT = struct.Struct(">B30s")
+# game_result 描述器的固定部分 (vid, gmtype), 後面接著開牌結果 JSON
+GAME_RESULT_PREFIX_STRUCT = struct.Struct(">4s4s")
+
+
+def sample_detail_items(detail_count=3):
+    """產生 settle_resp 的下注詳情 (detail_count 筆)"""
+    return b"".join(
+        SETTLE_DETAIL_STRUCT.pack(playtype, f"{playtype * 100.5:.2f}".encode()) for playtype in range(detail_count)
+    )
+
+
+def build_settle_resp_body(detail_count=3):
+    """依照 settle_resp 描述器的格式產生結算協議本體 (4s14sI30sB + detail_count * B30s)"""
+    prefix = SETTLE_RESP_PREFIX_STRUCT.pack(
+        SAMPLE_VALUES["vid"].encode(), SAMPLE_VALUES["gmcode"].encode(), 1, SAMPLE_VALUES["res"].encode(), detail_count
+    )
+    return prefix + sample_detail_items(detail_count)
+
+
+def build_game_result_body():
+    """依照 game_result 描述器的格式產生開牌結果協議本體 (4s4s + JSON)"""
+    prefix = GAME_RESULT_PREFIX_STRUCT.pack(SAMPLE_VALUES["vid"].encode(), SAMPLE_VALUES["gmtype"].encode())
+    return prefix + json.dumps(GAME_RESULT_JSON).encode()
+
+
+def sample_fields(protocol_name):
+    """產生協議固定長度欄位的數值 {field: value}"""
+    values = {}
+    for field, size, field_type in PROTOCOLS[protocol_name]["fields"]:
+        if size == 0:
+            continue    # 不定長度欄位由 sample_tail() 產生
+        if field_type == "V":
+            values[field] = SAMPLE_VALUES.get(field, "x" * 16)    # 長度前綴欄位
+        elif field_type == "s":
+            values[field] = SAMPLE_VALUES.get(field, "x" * min(size, 16))
+        else:
+            values[field] = SAMPLE_INTS.get(field_type, 1)
+    return values
+
+
+def sample_tail(protocol_name, detail_count=3):
+    """產生協議不定長度部分的資料 (settle_resp 的下注詳情, game_result 的 JSON 等)"""
+    if protocol_name == "settle_resp":
+        return sample_detail_items(detail_count)
+    if any(size == 0 for _, size, _ in PROTOCOLS[protocol_name]["fields"]):
+        return json.dumps(GAME_RESULT_JSON).encode()
+    return b""
+
+
+def build_body(packet_handler, protocol_name, detail_count=3):
+    """產生協議本體 (不含header)"""
+    values = sample_fields(protocol_name)
+    if protocol_name == "settle_resp":
+        values["count"] = detail_count
+    return packet_handler.pack_data(protocol_name, **values) + sample_tail(protocol_name, detail_count)
+
+
+def build_frame(packet_handler, protocol_name, detail_count=3):
+    """產生完整的協議封包 (含header)"""
+    body = build_body(packet_handler, protocol_name, detail_count)
+    return struct.pack(HEADER_FORMAT, PROTOCOLS[protocol_name]["cmd"], HEADER_SIZE + len(body), 0) + body
@@ -1,9 +1,13 @@
 import asyncio
 import struct
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import List
 
+from packet.codec import CODECS, HEADER_STRUCT, next_seq, pack_header_into
 from packet.packet_handler import PacketHandler
+from packet.send_coalescer import send_packet
+from packet.templates import packet_templates
 from game.playtype_enums import PlayTypeFactory
 from utils.logger import logger
 
@@ -20,6 +24,14 @@ SET_NO_COMM_SWITCH_RESP_CMD = hex(
 SET_DUOBAO_REQ_CMD = packet_handler.PROTOCOLS["set_duobao_switch_req"]["cmd"]
 SET_DUOBAO_RESP_CMD = hex(packet_handler.PROTOCOLS["set_duobao_switch_resp"]["cmd"])
 
+# 免傭開關 (0: 關閉, 1: 開啟) 與多寶開關 (0 ~ 4) 的請求封包內容固定, import 時預先打包
+packet_templates.warm("set_no_commission_req", [{"flag": flag} for flag in (0, 1)])
+packet_templates.warm("set_duobao_switch_req", [{"flag": flag} for flag in range(5)])
+
+
+# 投注資訊格式, >BQ: > 表示大端序, B 表示 unsigned char (1 byte), Q 表示 unsigned long long (8 bytes)
+BET_INFO_STRUCT = struct.Struct(">BQ")
+
 
 @dataclass
 class BetInfo:
@@ -32,38 +44,71 @@ class BetInfo:
         """打包投注資訊為二進制格式
         >BQ: > 表示大端序, B 表示 unsigned char (1 byte), Q 表示 unsigned long long (8 bytes)
         """
-        return struct.pack(">BQ", self.play_type, self.credit)
+        return BET_INFO_STRUCT.pack(self.play_type, self.credit)
+
+
+@lru_cache(maxsize=64)
+def _encode_req_bet_prefix(vid: str, gmcode: str, ui_type: int) -> bytes:
+    """打包 req_bet 的固定部分 (vid, gmcode, UIType), 同一局投注期間內容不變, 快取起來重複使用"""
+    return CODECS["req_bet"].encode(vid=vid, gmcode=gmcode, UIType=ui_type)
+
+
+class BetPacketBuilder:
+    """投注請求封包建構器
+
+    將 header、req_bet 固定部分和所有 BetInfo 一次寫入預先配置好的 bytearray,
+    req_bet 固定部分 (vid, gmcode, UIType) 在整個投注階段內快取, 同一局的多次投注/加注不需重新打包
+
+    Args:
+        vid: 桌台ID
+        gmcode: 遊戲代碼
+        ui_type: UIType, 預設為1
+    """
+
+    def __init__(self, vid: str, gmcode: str, ui_type: int = 1):
+        self.vid = vid
+        self.gmcode = gmcode
+        self.prefix = _encode_req_bet_prefix(vid, gmcode, ui_type)
+
+    def build(self, bet_infos: List[BetInfo], seq: int = 0) -> memoryview:
+        """構建投注請求封包 (含header)
+
+        Args:
+            bet_infos: 投注資訊
+            seq: header中的序列號, 需要以序列號對應 bet_resp 時傳入 next_seq()
+
+        Returns:
+            memoryview: 封包內容的視圖, 直接交給送出函數, 不另外複製成 bytes
+        """
+        header_size = HEADER_STRUCT.size
+        prefix_end = header_size + len(self.prefix)
+        total_size = prefix_end + BET_INFO_STRUCT.size * len(bet_infos)
+
+        buffer = bytearray(total_size)
+        pack_header_into(buffer, 0, REQ_BET_CMD, total_size, seq)
+        buffer[header_size:prefix_end] = self.prefix
+
+        offset = prefix_end
+        for bet_info in bet_infos:
+            BET_INFO_STRUCT.pack_into(buffer, offset, bet_info.play_type, bet_info.credit)
+            offset += BET_INFO_STRUCT.size
+        return memoryview(buffer)
 
 
 def construct_bet_packet(
-    packet_handler, vid: str, gmcode: str, bet_infos: List[BetInfo]
-) -> bytes:
+    packet_handler, vid: str, gmcode: str, bet_infos: List[BetInfo], seq: int = 0, ui_type: int = 1
+) -> memoryview:
     """構建投注請求封包
 
     Args:
+        packet_handler: 保留以相容既有的呼叫方式, 不再使用 (header 長度由 HEADER_STRUCT 取得)
         vid: 桌台ID
         gmcode: 遊戲代碼
         bet_infos: 投注資訊
+        seq: header中的序列號
+        ui_type: UIType, 預設為1
     """
-    # 1. 打包所有投注資訊
-    bet_data = b""
-    for bet_info in bet_infos:
-        bet_data += bet_info.pack()
-
-    # 2. 構建基本資料
-    data = packet_handler.pack_data(
-        "req_bet",
-        vid=vid,
-        gmcode=gmcode,
-        UIType=1,
-    )
-
-    # 在資料後面添加bet_data
-    data += bet_data
-
-    # 3. 添加header
-    header = packet_handler.pack_header(REQ_BET_CMD, size=len(data), seq=0)
-    return header + data
+    return BetPacketBuilder(vid, gmcode, ui_type).build(bet_infos, seq)
 
 
 async def wait_for_betting_phase(
@@ -73,80 +118,50 @@ async def wait_for_betting_phase(
     等待進入投注階段, 這邊單獨寫function, 不使用packet_handler.wait_for_response()的原因是
     這邊需要同時監聽桌台狀態和停止下注信號, 並在任一事件發生時返回
 
+    table_status 與 stop_bet 合併成單一依序的封包串流, 只接收此桌台的封包,
+    等待時只需要等待一個佇列, 每次狀態變化不需要建立與取消 Task
+
     Args:
         gate_handler: Gate Server 連線處理器
         table_id: 桌台ID
     """
+    try:
+        # table_status 是最頻繁的廣播, 只解包需要的欄位
+        async with gate_handler.packet_handler.stream(
+            TABLE_STATUS_CMD, STOP_BET_CMD, vid=table_id, fields=("vid", "status", "gmcode")
+        ) as events:
+            while True:
+                try:
+                    packet = await events.get(timeout=30)
+                except asyncio.TimeoutError:
+                    logger.error(f"Timeout waiting for betting phase on table {table_id}")
+                    return False, None, None
+
+                if packet["cmd"] == STOP_BET_CMD:
+                    logger.info(f"Table: {table_id} received stop bet")
+                    return False, None, None
+
+                data = packet.data
+                if data is not None and data.get("status") == 1:  # 等待下注狀態
+                    vid = data.get("vid")
+                    logger.info(f"Table {vid} is ready for betting")
+                    return True, data.get("gmcode"), vid
+                # 減少debug log數量, 暫時註解掉
+                # logger.debug(f"Table: {table_id}, current status: {data.get('status')}")
 
-    # 獲取當前事件循環引用
-    current_loop = asyncio.get_running_loop()
-
-    status_queue = await gate_handler.packet_handler.register_handler(TABLE_STATUS_CMD)
-    stop_bet_queue = await gate_handler.packet_handler.register_handler(STOP_BET_CMD)
-
-    while True:
-        try:
-
-            # 明確創建任務
-            status_task = current_loop.create_task(status_queue.get())
-            stop_bet_task = current_loop.create_task(stop_bet_queue.get())
-
-            # 同時監聽桌台狀態和停止下注信號
-            # 使用隱性等待 (Implicit Waiting) - asyncio.wait() 接收協程列表 [status_queue.get(), stop_bet_queue.get()]
-            # 內部自動將每個協程轉換為 asyncio.Task 對象
-            # 並行執行這些任務
-            # 當任一任務完成時，wait() 返回
-            # done 集合包含已完成的 Task，pending 集合包含未完成的 Task
-            done, pending = await asyncio.wait(
-                [status_task, stop_bet_task],
-                return_when=asyncio.FIRST_COMPLETED,
-                timeout=30,
-            )
-
-            # 取消未完成的任務
-            for task in pending:
-                task.cancel()
-
-            # 處理完成的任務
-            try:
-                response = done.pop().result()
-                cmd = response.get("cmd")
-
-                if cmd == TABLE_STATUS_CMD:
-                    status = response.get("data", {}).get("status")
-                    vid = response.get("data", {}).get("vid")
-
-                    if vid == table_id and status == 1:  # 等待下注狀態
-                        gmcode = response.get("data", {}).get("gmcode")
-                        logger.info(f"Table {vid} is ready for betting")
-                        return True, gmcode, vid
-                    # 減少debug log數量, 暫時註解掉
-                    # if vid == table_id:
-                    #     logger.debug(f"Table: {vid}, current status: {status}")
-
-                elif cmd == STOP_BET_CMD:
-                    vid = response.get("data", {}).get("vid")
-                    if vid == table_id:
-                        logger.info(f"Table: {vid} received stop bet")
-                        return False, None, None
-
-            except Exception as e:
-                logger.error(f"Error getting task result: {e}")
-                import traceback
-
-                logger.error(traceback.format_exc())
-                return False, None, None
+    except Exception as e:
+        logger.error(f"Error waiting for betting phase: {e}")
+        import traceback
 
-        except Exception as e:
-            logger.error(f"Error waiting for betting phase: {e}")
-            return False, None, None
+        logger.error(traceback.format_exc())
+        return False, None, None
 
 
 async def place_bet(
     gate_handler, bet_infos: List[BetInfo], game_type="bac", table_id="BC51", max_retries: int = 5
 ) -> bool:
     """執行投注
-    1. 等待投注階段
+    1. 等待投注階段 (有啟用桌台狀態快取且桌台已經開放投注時略過)
     2. 發送投注請求
     3. 等待回應
 
@@ -176,26 +191,35 @@ async def place_bet(
         logger.warning(f"{e} - Will use numeric play type codes")
         PlayType = None
 
+    # 連線有啟用桌台狀態快取時, 桌台已經在投注階段且剩餘時間足夠就直接投注
+    table_state_cache = getattr(gate_handler, "table_state_cache", None)
+    if table_state_cache is not None:
+        table_state_cache.track(table_id)
+
     while retry_count < max_retries:
-        # 等待投注階段
-        betting_available, gmcode, vid = await wait_for_betting_phase(
-            gate_handler, table_id
+        table_state = (
+            table_state_cache.open_window(table_id) if table_state_cache is not None else None
         )
+        if table_state is not None:
+            betting_available, gmcode, vid = True, table_state.gmcode, table_state.vid
+            logger.info(
+                f"Table {vid} is already open for betting, "
+                f"{table_state.remaining(table_state_cache.betting_window):.1f}s remaining"
+            )
+        else:
+            # 等待投注階段
+            betting_available, gmcode, vid = await wait_for_betting_phase(
+                gate_handler, table_id
+            )
         if not betting_available:
             logger.info("Waiting for new game round...")
             retry_count += 1
             continue  # 繼續等待下一個投注階段
 
         try:
-            # 註冊投注回應處理
-            bet_resp_queue = await gate_handler.packet_handler.register_handler(
-                BET_RESP_CMD
-            )
-
-            # 發送投注請求
-            packet = construct_bet_packet(
-                gate_handler.packet_handler, vid, gmcode, bet_infos
-            )
+            # 發送投注請求, 以序列號對應 bet_resp, 同一連線同時有多個投注時不會互相取走回應
+            seq = next_seq()
+            packet = construct_bet_packet(gate_handler.packet_handler, vid, gmcode, bet_infos, seq)
             # 顯示下注玩法資訊
             try:
                 # 記錄下注詳情
@@ -217,11 +241,17 @@ async def place_bet(
                 # 如果無法導入玩法枚舉，則顯示數字代碼
                 logger.info(f"Betting with raw play types: {[f'{b.play_type}: {b.credit}' for b in bet_infos]}")
 
-            await gate_handler.send(packet, "Bet Request")
-            logger.info(f"Betting on {table_id} / {gmcode} with: {', '.join(bet_details)}")
+            # 登記等待中的投注回應, server 回應的 seq 為0時以 vid 對應
+            bet_resp_future = gate_handler.packet_handler.expect_response(
+                BET_RESP_CMD, seq, match={"vid": vid}
+            )
 
             try:
-                response = await asyncio.wait_for(bet_resp_queue.get(), timeout=15)
+                # 投注請求對延遲敏感, 有啟用送出合併時也立即送出
+                await send_packet(gate_handler, packet, "Bet Request", flush=True)
+                logger.info(f"Betting on {table_id} / {gmcode} with: {', '.join(bet_details)}")
+
+                response = await asyncio.wait_for(bet_resp_future, timeout=15)
                 # 處理投注回應
                 bet_resp_code = response.get("data", {}).get("code")
                 bet_resp_vid = response.get("data", {}).get("vid")  # 先取table id備用
@@ -321,6 +351,9 @@ async def place_bet(
                     # return False, -1, None
                 continue
 
+            finally:
+                gate_handler.packet_handler.cancel_pending(BET_RESP_CMD, seq)
+
         except Exception as e:
             retry_count += 1
             logger.error(f"Error placing bet: {e}")
@@ -374,19 +407,13 @@ async def raise_bet(
             logger.error("Error: current_gmcode is required for raise_bet")
             return -1
 
-        # 註冊投注回應處理
-        bet_resp_queue = await gate_handler.packet_handler.register_handler(
-            BET_RESP_CMD
-        )
-
         # 使用提供的 gmcode 和 table_id
         gmcode = current_gmcode
         vid = table_id
 
-        # 構建並發送投注請求
-        packet = construct_bet_packet(
-            gate_handler.packet_handler, vid, gmcode, bet_infos
-        )
+        # 構建並發送投注請求, 以序列號對應 bet_resp, 避免與同時進行的 place_bet 互相取走回應
+        seq = next_seq()
+        packet = construct_bet_packet(gate_handler.packet_handler, vid, gmcode, bet_infos, seq)
 
         # 顯示加注玩法資訊
         bet_details = []
@@ -401,10 +428,16 @@ async def raise_bet(
             bet_details.append(f"{play_type_name}({bet.play_type}) - ${bet.credit}")
 
         logger.info(f"Increasing bet on {table_id} / {gmcode} with: {', '.join(bet_details)}")
-        await gate_handler.send(packet, "Increase Bet Request")
+        bet_resp_future = gate_handler.packet_handler.expect_response(
+            BET_RESP_CMD, seq, match={"vid": vid}
+        )
+        try:
+            await send_packet(gate_handler, packet, "Increase Bet Request", flush=True)
 
-        # 等待投注回應
-        response = await asyncio.wait_for(bet_resp_queue.get(), timeout=15)
+            # 等待投注回應
+            response = await asyncio.wait_for(bet_resp_future, timeout=15)
+        finally:
+            gate_handler.packet_handler.cancel_pending(BET_RESP_CMD, seq)
         bet_resp_code = response.get("data", {}).get("code")
 
         # 處理回應結果
@@ -431,37 +464,40 @@ def construct_set_nocomm_switch_req_packet(packet_handler, flag: int) -> bytes:
         flag: 免傭開關 (0: 關閉免傭, 1: 開啟免傭)
 
     Returns:
-        bytes: 封包資料
+        bytes: 封包資料, 相同flag返回同一個預先打包好的封包
     """
-    data = packet_handler.pack_data(
-        "set_no_commission_req",
-        flag=flag,
-    )
-
-    header = packet_handler.pack_header(
-        SET_NO_COMM_SWITCH_REQ_CMD, size=len(data), seq=0
-    )
-
-    return header + data
+    return packet_templates.get("set_no_commission_req", flag=flag)
 
 
 async def set_nocomm_switch(gate_handler, flag: int) -> bool:
     """發送設置免傭開關請求
+
+    同一個連線上同時設置相同 flag 時只送出一次請求, 共用同一個回應結果
+
     Args:
         gate_handler: Gate Server 連線處理器
         flag: 免傭開關 (0: 關閉免傭, 1: 開啟免傭)
     Returns:
         bool: 請求是否成功
     """
+    return await gate_handler.packet_handler.single_flight.run(
+        (SET_NO_COMM_SWITCH_REQ_CMD, flag), _set_nocomm_switch, gate_handler, flag
+    )
+
+
+async def _set_nocomm_switch(gate_handler, flag: int) -> bool:
+    """實際送出設置免傭開關請求並等待回應"""
     try:
+        # 先註冊回應佇列再送出請求, 避免回應在註冊前就到達而遺失
+        set_nocomm_resp_queue = await gate_handler.packet_handler.register_handler(
+            SET_NO_COMM_SWITCH_RESP_CMD
+        )
+
         packet = construct_set_nocomm_switch_req_packet(packet_handler, flag)
-        await gate_handler.send(packet, "Set No Commission Switch Request")
+        await send_packet(gate_handler, packet, "Set No Commission Switch Request")
         # log_and_print(f"Set No Commission Switch Request sent with flag: {flag}", level=logging.DEBUG)
 
         # 等待回應
-        set_nocomm_resp_queue = await gate_handler.packet_handler.register_handler(
-            SET_NO_COMM_SWITCH_RESP_CMD
-        )
         response = await asyncio.wait_for(set_nocomm_resp_queue.get(), timeout=10)
         # log_and_print(f"Set No Commission Switch Response: {response}", level=logging.DEBUG)
 
@@ -487,20 +523,16 @@ def construct_set_duobao_switch_req_packet(packet_handler, flag: int) -> bytes:
         flag: 多寶開關 (0: 幸運六 1: 經典 2: 龍寶 3: 多寶 4: 幸運七(預設))
 
     Returns:
-        bytes: 封包資料
+        bytes: 封包資料, 相同flag返回同一個預先打包好的封包
     """
-    data = packet_handler.pack_data(
-        "set_duobao_switch_req",
-        flag=flag,
-    )
-
-    header = packet_handler.pack_header(SET_DUOBAO_REQ_CMD, size=len(data), seq=0)
-
-    return header + data
+    return packet_templates.get("set_duobao_switch_req", flag=flag)
 
 
 async def set_duobao_switch(gate_handler, flag: int) -> bool:
     """發送設置多寶開關請求
+
+    同一個連線上同時設置相同 flag 時只送出一次請求, 共用同一個回應結果
+
     Args:
         gate_handler: Gate Server 連線處理器
         flag: 多寶開關 (0: 幸運六 1: 經典 2: 龍寶 3: 多寶 4: 幸運七(預設))
@@ -508,15 +540,24 @@ async def set_duobao_switch(gate_handler, flag: int) -> bool:
     Returns:
         bool: 請求是否成功
     """
+    return await gate_handler.packet_handler.single_flight.run(
+        (SET_DUOBAO_REQ_CMD, flag), _set_duobao_switch, gate_handler, flag
+    )
+
+
+async def _set_duobao_switch(gate_handler, flag: int) -> bool:
+    """實際送出設置多寶開關請求並等待回應"""
     try:
+        # 先註冊回應佇列再送出請求, 避免回應在註冊前就到達而遺失
+        set_duobao_resp_queue = await gate_handler.packet_handler.register_handler(
+            SET_DUOBAO_RESP_CMD
+        )
+
         packet = construct_set_duobao_switch_req_packet(packet_handler, flag)
-        await gate_handler.send(packet, "Set DuoBao Switch Request")
+        await send_packet(gate_handler, packet, "Set DuoBao Switch Request")
         # log_and_print(f"Set DuoBao Switch Request sent with flag: {flag}", level=logging.DEBUG)
 
         # 等待回應
-        set_duobao_resp_queue = await gate_handler.packet_handler.register_handler(
-            SET_DUOBAO_RESP_CMD
-        )
         response = await asyncio.wait_for(set_duobao_resp_queue.get(), timeout=10)
         logger.debug(f"Set DuoBao Switch Response: {response}")
 
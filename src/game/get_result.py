@@ -1,5 +1,6 @@
 import asyncio
 import json
+from functools import partial
 
 from packet.packet_handler import PacketHandler
 from utils.logger import logger
@@ -31,8 +32,12 @@ async def recv_game_result(gate_handler, table_id="BC51", expected_gmcode=None,
             "raw_json": {...}               # 原始JSON數據
         }
     """
+    game_results = None
     try:
-        game_result_queue = await gate_handler.packet_handler.register_handler(GAME_RESULT_CMD)
+        # 只訂閱此桌台與此局號的開牌結果, 其他桌台 / 其他局的結果不會放入串流
+        game_results = gate_handler.packet_handler.stream(
+            GAME_RESULT_CMD, vid=table_id, filter=partial(_match_gmcode, expected_gmcode)
+        )
         
         # 記錄開始等待的時間
         start_time = asyncio.get_event_loop().time()
@@ -47,16 +52,19 @@ async def recv_game_result(gate_handler, table_id="BC51", expected_gmcode=None,
             
             try:
                 # 使用剩餘超時時間等待
-                response = await asyncio.wait_for(game_result_queue.get(), timeout=remaining_timeout)
+                response = await game_results.get(timeout=remaining_timeout)
                 logger.debug(f"Game result: {response}")
 
                 protocol_data = response.get("data", {})   # 實際協議內容
                 vid = protocol_data.get("vid")             # 桌台ID
                 gmtype = protocol_data.get("gmtype")       # 遊戲類型
-                game_result_json = protocol_data.get("json", "{}")  # 前一局開牌結果的json字串, 根據不同遊戲類型, 該json內容會不同, 為不定長度
+                # 前一局開牌結果的json字串, 根據不同遊戲類型, 該json內容會不同, 為不定長度
+                # 解析結果為 dict, 或啟用 typed 解析時為 GameResultJson (同樣以 get() 取值)
+                game_result_json = protocol_data.get("json", "{}")
                 gmcode = game_result_json.get("gmcode")  # 遊戲局號
                 res_decimal = game_result_json.get("res", 0)  # 開牌結果的十進位數值
                 
+                # 桌台與局號已由訂閱條件過濾, 以下檢查僅作為防護
                 if vid != table_id:
                     # 桌台不匹配，記錄但不返回，繼續等待
                     logger.debug(f"Received game result for wrong table: {vid}, expected: {table_id}. Continuing to wait...")
@@ -140,4 +148,14 @@ async def recv_game_result(gate_handler, table_id="BC51", expected_gmcode=None,
         import traceback
         logger.error(traceback.format_exc())
         return False, None
+
+    finally:
+        if game_results is not None:
+            game_results.close()
+
+
+def _match_gmcode(expected_gmcode, data):
+    """開牌結果的局號在 json 內容中, 比對是否為等待的局號"""
+    game_result_json = data.get("json")
+    return hasattr(game_result_json, "get") and game_result_json.get("gmcode") == expected_gmcode
     
\ No newline at end of file
@@ -25,10 +25,12 @@ async def recv_settle_resp(gate_handler, table_id="BC51", return_details=False):
         else:
             bool, float: (成功與否, 總派彩金額)
     """
+    settle_resps = None
     try:
-        settle_resp_queue = await gate_handler.packet_handler.register_handler(SETTLE_RESP_CMD)
+        # 只接收此桌台的結算, 呼叫之前殘留的結算不會被讀取
+        settle_resps = gate_handler.packet_handler.stream(SETTLE_RESP_CMD, vid=table_id)
         try:
-            response = await asyncio.wait_for(settle_resp_queue.get(), timeout=30)  # 先設定30秒超時, 目前REL設定一局是20s
+            response = await settle_resps.get(timeout=30)  # 先設定30秒超時, 目前REL設定一局是20s
             logger.debug(f"settle resp: {response}")
 
             data = response.get("data")
@@ -40,13 +42,11 @@ async def recv_settle_resp(gate_handler, table_id="BC51", return_details=False):
             # order_detail = data.get("detail_items") # 派彩詳細資訊
 
             # 20250729 - 調整order_detail的資料型態, 原始raw data是list, 但需要一個dict來方便查詢
-            order_detail = {}
-            for item in data.get("detail_items", []):
-                playtype = item.get("playtype")
-                winlose = item.get("winlose", 0.0)
-                order_detail[playtype] = winlose
+            # settle_resp 描述器已直接將派彩詳細資訊解析為 {playtype: winlose}, 不需要再轉換
+            order_detail = data.get("detail_items", {})
 
 
+            # 桌台已由串流條件過濾, 以下檢查僅作為防護
             if vid != table_id:
                 logger.warning(f"Received settle response for wrong table: {vid}")
                 return False, None
@@ -73,3 +73,6 @@ async def recv_settle_resp(gate_handler, table_id="BC51", return_details=False):
     except Exception as e:
         logger.error(f"Error registering settle response handler: {e}")
         return False, None
+    finally:
+        if settle_resps is not None:
+            settle_resps.close()
@@ -0,0 +1,186 @@
+import time
+
+from protocols.protocols import PROTOCOLS
+from utils.logger import logger
+
+# 常數定義
+TABLE_STATUS_CMD = PROTOCOLS["table_status"]["cmd"]
+STOP_BET_CMD = PROTOCOLS["stop_bet"]["cmd"]
+BETTING_STATUS = 1  # table_status 的 status 為1表示進入投注階段
+
+# 投注階段長度 (秒) 與直接投注所需的最少剩餘時間 (秒), 剩餘時間不足時等待下一個投注階段
+DEFAULT_BETTING_WINDOW = 20.0
+DEFAULT_MIN_REMAINING = 5.0
+
+
+class TableState:
+    """
+    單一桌台目前的階段
+
+    屬性:
+    - vid (str): 桌台ID
+    - status (int | None): 最新的 table_status status, 收到 stop_bet 後為 None
+    - gmcode (str | None): 目前這一局的gmcode
+    - betting (bool): 是否在投注階段
+    - phase_started_at (float): 目前階段開始的時間 (time.monotonic())
+    - start_observed (bool): 是否有看到階段開始, 連線後第一次收到的狀態不知道實際開始時間, 不能用來估算剩餘時間
+    """
+
+    __slots__ = ("vid", "status", "gmcode", "betting", "phase_started_at", "start_observed")
+
+    def __init__(self, vid):
+        self.vid = vid
+        self.status = None
+        self.gmcode = None
+        self.betting = False
+        self.phase_started_at = 0.0
+        self.start_observed = False
+
+    def remaining(self, betting_window, now=None):
+        """返回投注階段的剩餘時間 (秒), 不在投注階段或不知道開始時間時返回 0"""
+        if not self.betting or not self.start_observed:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(betting_window - (now - self.phase_started_at), 0.0)
+
+
+class TableStateCache:
+    """
+    持續追蹤連線上指定桌台的階段、gmcode 與階段開始時間
+
+    第一次 track() 時才掛到 table_status / stop_bet 的最新值通道上, 處理器收到追蹤中桌台的狀態時同步更新,
+    其他桌台的廣播只解包 vid 就略過; place_bet 可以直接判斷桌台是否已經在投注階段且剩餘時間足夠,
+    不需要等待下一次 status == 1
+
+    階段開始時間只在實際看到階段轉換時記錄, 開始追蹤時桌台已經在投注階段的話不知道剩餘時間, 需要等待下一個投注階段
+
+    Args:
+        packet_handler: 連線的封包處理器
+        betting_window (float): 投注階段長度(秒)
+        min_remaining (float): 直接投注所需的最少剩餘時間(秒)
+
+    方法:
+    - track(vid): 開始追蹤桌台
+    - untrack(vid): 停止追蹤桌台
+    - get(vid): 返回桌台目前的 TableState, 尚未收到狀態時返回 None
+    - open_window(vid, min_remaining=None): 桌台在投注階段且剩餘時間足夠時返回 TableState, 否則返回 None
+    - close(): 停止追蹤
+    """
+
+    def __init__(self, packet_handler, betting_window=DEFAULT_BETTING_WINDOW, min_remaining=DEFAULT_MIN_REMAINING):
+        self.packet_handler = packet_handler
+        self.betting_window = betting_window
+        self.min_remaining = min_remaining
+        self._states = {}   # {vid: TableState}
+        self._tracked = set()
+        self._status_channel = None
+        self._stop_bet_channel = None
+
+    def track(self, vid):
+        """開始追蹤桌台, 第一次呼叫時才掛到最新值通道上"""
+        self._tracked.add(vid)
+        if self._status_channel is None:
+            self._status_channel = self.packet_handler.latest_channel(TABLE_STATUS_CMD, fields=("vid", "status", "gmcode"))
+            self._stop_bet_channel = self.packet_handler.latest_channel(STOP_BET_CMD, fields=("vid",))
+            self._status_channel.add_listener(self._on_table_status)
+            self._stop_bet_channel.add_listener(self._on_stop_bet)
+
+    def untrack(self, vid):
+        """停止追蹤桌台並清除其狀態"""
+        self._tracked.discard(vid)
+        self._states.pop(vid, None)
+
+    def _state(self, vid):
+        state = self._states.get(vid)
+        if state is None:
+            state = self._states[vid] = TableState(vid)
+        return state
+
+    def _on_table_status(self, vid, packet):
+        """更新桌台狀態, 進入投注階段或換局時記錄階段開始時間"""
+        if vid not in self._tracked:
+            return
+        data = packet.data
+        if data is None:
+            return
+        status = data.get("status")
+        gmcode = data.get("gmcode")
+        state = self._states.get(vid)
+        betting = status == BETTING_STATUS
+
+        if state is None:
+            # 第一次收到此桌台的狀態, 不知道這個階段已經開始多久
+            state = self._state(vid)
+            state.phase_started_at = time.monotonic()
+            state.start_observed = False
+        elif betting != state.betting or (betting and gmcode != state.gmcode):
+            state.phase_started_at = time.monotonic()
+            state.start_observed = True
+
+        state.status = status
+        state.gmcode = gmcode
+        state.betting = betting
+
+    def _on_stop_bet(self, vid, packet):
+        """收到停止下注, 投注階段結束"""
+        if vid not in self._tracked:
+            return
+        state = self._state(vid)
+        if state.betting:
+            state.phase_started_at = time.monotonic()
+            state.start_observed = True
+        state.status = None
+        state.betting = False
+
+    def get(self, vid):
+        """返回桌台目前的 TableState, 尚未收到狀態時返回 None"""
+        return self._states.get(vid)
+
+    def open_window(self, vid, min_remaining=None):
+        """
+        桌台目前是否可以直接投注
+
+        Args:
+            vid: 桌台ID
+            min_remaining (float | None): 最少剩餘時間(秒), None 時使用 self.min_remaining
+
+        Returns:
+            TableState | None: 在投注階段且剩餘時間足夠時返回桌台狀態, 否則返回 None
+        """
+        state = self._states.get(vid)
+        if state is None or not state.gmcode or not state.start_observed:
+            return None
+        min_remaining = self.min_remaining if min_remaining is None else min_remaining
+        if state.remaining(self.betting_window) < min_remaining:
+            return None
+        return state
+
+    def close(self):
+        """停止追蹤並清除所有狀態"""
+        if self._status_channel is not None:
+            self._status_channel.remove_listener(self._on_table_status)
+            self._stop_bet_channel.remove_listener(self._on_stop_bet)
+        self._tracked.clear()
+        self._states.clear()
+
+
+def enable_table_state_cache(gate_handler, betting_window=DEFAULT_BETTING_WINDOW, min_remaining=DEFAULT_MIN_REMAINING):
+    """為 gate 連線啟用桌台狀態快取, 之後 place_bet 追蹤下注的桌台, 桌台已經開放投注時直接投注
+
+    預設不啟用, 快取只追蹤 place_bet 下注過的桌台, 沒有下注的連線仍會略過所有狀態廣播
+
+    Returns:
+        TableStateCache: 綁定在 gate_handler.table_state_cache 的桌台狀態快取
+    """
+    disable_table_state_cache(gate_handler)
+    gate_handler.table_state_cache = TableStateCache(gate_handler.packet_handler, betting_window, min_remaining)
+    logger.debug(f"Table state cache enabled, betting window: {betting_window}s, min remaining: {min_remaining}s")
+    return gate_handler.table_state_cache
+
+
+def disable_table_state_cache(gate_handler):
+    """停用桌台狀態快取"""
+    cache = getattr(gate_handler, "table_state_cache", None)
+    if cache is not None:
+        gate_handler.table_state_cache = None
+        cache.close()
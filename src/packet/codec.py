@@ -0,0 +1,373 @@
+import struct
+
+from protocols.protocols import HEADER_FORMAT, PROTOCOLS
+from protocols.records import make_record_class
+from protocols.string_cache import INTERN_MAX_SIZE, codec_string_cache
+
+# header 的編解碼器, 全域只需要編譯一次 (">III", 12 bytes)
+HEADER_STRUCT = struct.Struct(HEADER_FORMAT)
+
+# 長度前綴字串欄位的型態, 欄位定義為 (field, 前綴長度, "V"), 例如 ("state_data", 2, "V") 表示 2 bytes 長度 + 內容
+LENGTH_PREFIXED_TYPE = "V"
+LENGTH_PREFIX_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+# 不定長度欄位的解析步驟
+_FIXED, _TAIL, _PREFIXED = range(3)
+
+
+class ProtocolCodec:
+    """
+    單一協議的編解碼器, 持有預先編譯好的 struct.Struct
+
+    在 import 時就依照 PROTOCOLS 內的 format 字串編譯好, 之後每個封包的打包 / 解包
+    都直接呼叫 Struct 物件的 pack_into / unpack_from, 不需要每次重新解析 format 字串
+
+    屬性:
+    - name (str): 協議名稱
+    - cmd (int): 協議號
+    - fields (list): 協議欄位定義 [(field, size, field_type), ...]
+    - struct (struct.Struct): 預先編譯好的 Struct 物件, 有不定長度欄位時只包含固定長度的部分
+    - size (int): 協議本體固定長度 (不含header), 有不定長度欄位時為最小長度
+    - variable (bool): 是否包含不定長度欄位
+    - record_class (type | None): 解包結果使用的 ProtocolRecord 子類, 無法產生時為 None (使用 dict)
+
+    不定長度欄位有兩種:
+    - 長度為0的字串欄位 ("json", 0, "s"): 佔用協議本體中其餘欄位以外的所有資料, 每個協議只能有一個
+    - 長度前綴欄位 ("state_data", 2, "V"): 先以 size bytes 的無號整數記錄長度, 後面接著內容
+
+    不定長度欄位解包時以 utf-8 解碼並去除結尾的 \\x00 與空白字元, 內容不是文字 (例如二進位的下注詳情) 時保留原始 bytes
+    """
+
+    def __init__(self, name, protocol):
+        self.name = name
+        self.cmd = protocol["cmd"]
+        self.fields = protocol["fields"]
+        self.variable = any(
+            field_type == LENGTH_PREFIXED_TYPE or (field_type == "s" and size == 0)
+            for _, size, field_type in self.fields
+        )
+        if self.variable:
+            self._compile_variable_layout(protocol)
+        else:
+            self.struct = struct.Struct(protocol["format"])
+        self.size = self.struct.size
+
+        # 預先記錄欄位名稱與型態, 避免每次編解碼都要重新拆解 tuple
+        self.field_names = tuple(field for field, _, _ in self.fields)
+        self.record_class = make_record_class(name, self.field_names)
+        # 字串欄位分為兩類: 短的代碼欄位 (vid, gmcode...) 透過快取解碼, 其餘直接解碼
+        self._interned_indexes = tuple(
+            index for index, (_, size, field_type) in enumerate(self.fields)
+            if field_type == "s" and 0 < size <= INTERN_MAX_SIZE
+        )
+        self._string_indexes = tuple(
+            index for index, (_, size, field_type) in enumerate(self.fields)
+            if field_type == "s" and size > INTERN_MAX_SIZE
+        )
+        self._variable_indexes = tuple(
+            index for index, (_, size, field_type) in enumerate(self.fields)
+            if field_type == LENGTH_PREFIXED_TYPE or (field_type == "s" and size == 0)
+        )
+        self._projections = {}  # 已編譯的欄位投影 {frozenset(fields): FieldProjection | None}
+
+    def _compile_variable_layout(self, protocol):
+        """將欄位依序編譯為解析步驟: 連續的固定長度欄位合併為一個 Struct, 不定長度欄位各自一個步驟"""
+        fmt = protocol.get("format", "")
+        byte_order = fmt[0] if fmt[:1] in ("@", "=", "<", ">", "!") else ">"
+
+        steps = []
+        fixed_formats = []      # 所有固定長度部分, 用於計算最小長度
+        group_formats, group_indexes = [], []
+        tail_index = None
+
+        def close_group():
+            if group_indexes:
+                steps.append([_FIXED, struct.Struct(byte_order + "".join(group_formats)), tuple(group_indexes)])
+                group_formats.clear()
+                group_indexes.clear()
+
+        for index, (field, size, field_type) in enumerate(self.fields):
+            if field_type == LENGTH_PREFIXED_TYPE:
+                if size not in LENGTH_PREFIX_FORMATS:
+                    raise ValueError(f"Invalid length prefix size {size} for field '{field}' in protocol '{self.name}'")
+                if tail_index is not None:
+                    raise ValueError(f"Field '{field}' cannot follow variable-length tail in protocol '{self.name}'")
+                close_group()
+                prefix = struct.Struct(byte_order + LENGTH_PREFIX_FORMATS[size])
+                steps.append([_PREFIXED, prefix, index])
+                fixed_formats.append(LENGTH_PREFIX_FORMATS[size])
+            elif field_type == "s" and size == 0:
+                if tail_index is not None:
+                    raise ValueError(f"Protocol '{self.name}' has more than one variable-length tail")
+                close_group()
+                tail_index = index
+                steps.append([_TAIL, 0, index])
+            else:
+                format_char = f"{size}s" if field_type == "s" else field_type
+                group_formats.append(format_char)
+                group_indexes.append(index)
+                fixed_formats.append(format_char)
+        close_group()
+
+        # 尾端欄位的長度 = 剩餘資料 - 其後固定長度欄位的長度
+        for position, step in enumerate(steps):
+            if step[0] == _TAIL:
+                step[1] = sum(following[1].size for following in steps[position + 1:])
+
+        self.struct = struct.Struct(byte_order + "".join(fixed_formats))
+        self._steps = tuple(tuple(step) for step in steps)
+
+    def encode_into(self, buffer, offset=0, **kwargs):
+        """
+        將協議數據直接寫入預先配置好的 buffer
+
+        參數:
+        - buffer (bytearray): 寫入目標
+        - offset (int): 寫入起始位置
+        - **kwargs: 封包數據
+
+        返回:
+        - int: 寫入後的下一個位置
+        """
+        if self.variable:
+            data = self.encode(**kwargs)
+            buffer[offset:offset + len(data)] = data
+            return offset + len(data)
+        try:
+            self.struct.pack_into(buffer, offset, *self._values(kwargs))
+        except struct.error as e:
+            raise ValueError(f"Error packing data for protocol '{self.name}': {e}")
+        return offset + self.size
+
+    def encode(self, **kwargs):
+        """
+        打包協議數據
+
+        返回:
+        - bytes: 打包後的封包數據 (不含header)
+        """
+        try:
+            if self.variable:
+                return self._encode_variable(self._values(kwargs))
+            return self.struct.pack(*self._values(kwargs))
+        except struct.error as e:
+            raise ValueError(f"Error packing data for protocol '{self.name}': {e}")
+
+    def _encode_variable(self, values):
+        """依照解析步驟打包包含不定長度欄位的協議"""
+        parts = []
+        for kind, step_struct, index in self._steps:
+            if kind == _FIXED:
+                parts.append(step_struct.pack(*[values[i] for i in index]))
+            elif kind == _TAIL:
+                parts.append(values[index])
+            else:
+                value = values[index]
+                parts.append(step_struct.pack(len(value)))
+                parts.append(value)
+        return b"".join(parts)
+
+    def decode(self, data, offset=0):
+        """
+        從 data 的 offset 位置解包協議數據
+
+        參數:
+        - data (bytes | bytearray | memoryview): 封包數據
+        - offset (int): 協議本體起始位置
+
+        返回:
+        - ProtocolRecord | dict: 解包後的封包數據, 可用 record.field 或 record.get(field) 取值
+        """
+        if len(data) - offset < self.size:
+            raise ValueError(f"Data size {len(data) - offset} is too small for protocol '{self.name}' ({self.size} bytes)")
+
+        if self.variable:
+            values = self._unpack_variable(data, offset)
+        else:
+            values = list(self.struct.unpack_from(data, offset))
+        for index in self._interned_indexes:
+            values[index] = codec_string_cache.decode(values[index])
+        for index in self._string_indexes:
+            # 針對解析出來的字串做處理, 去掉前後的空白字元
+            values[index] = values[index].decode("utf-8").strip()
+        for index in self._variable_indexes:
+            values[index] = _decode_variable_value(values[index])
+        if self.record_class is not None:
+            return self.record_class(*values)
+        return dict(zip(self.field_names, values))
+
+    def _unpack_variable(self, data, offset):
+        """依照解析步驟解包包含不定長度欄位的協議, 返回各欄位的原始數值"""
+        values = [None] * len(self.fields)
+        end = len(data)
+        position = offset
+        for kind, step_struct, index in self._steps:
+            if kind == _FIXED:
+                for field_index, value in zip(index, step_struct.unpack_from(data, position)):
+                    values[field_index] = value
+                position += step_struct.size
+            elif kind == _TAIL:
+                # step_struct 為尾端欄位之後固定長度欄位的總長度
+                length = end - position - step_struct
+                values[index] = bytes(data[position:position + length])
+                position += length
+            else:
+                (length,) = step_struct.unpack_from(data, position)
+                position += step_struct.size
+                if position + length > end:
+                    raise ValueError(
+                        f"Field '{self.fields[index][0]}' length {length} exceeds data size for protocol '{self.name}'"
+                    )
+                values[index] = bytes(data[position:position + length])
+                position += length
+        return values
+
+    def projection(self, fields):
+        """
+        取得只解包部分欄位的投影解碼器, 相同欄位組合只編譯一次
+
+        參數:
+        - fields (iterable): 需要的欄位名稱
+
+        返回:
+        - FieldProjection | None: 投影解碼器, 無法依照固定位移計算時 (例如 native alignment) 返回 None, 需使用完整解包
+
+        有不定長度欄位的協議只能投影開頭連續的固定長度欄位 (例如 vid、gmcode), 其後的位移不固定
+        """
+        key = frozenset(fields)
+        if key not in self._projections:
+            unknown = key.difference(self.field_names)
+            if unknown:
+                raise ValueError(f"Unknown fields for protocol '{self.name}': {', '.join(sorted(unknown))}")
+            if self.variable:
+                self._projections[key] = self._prefix_projection(key)
+            else:
+                projection = FieldProjection(self, key)
+                self._projections[key] = projection if projection.struct.size == self.size else None
+        return self._projections[key]
+
+    def _prefix_projection(self, fields):
+        """不定長度協議開頭固定長度欄位的投影, 需要的欄位不全在開頭時返回 None"""
+        kind, prefix_struct, indexes = self._steps[0]
+        if kind != _FIXED or not all(self.field_names.index(field) in indexes for field in fields):
+            return None
+        projection = FieldProjection(self, fields, self.fields[:len(indexes)])
+        return projection if projection.struct.size == prefix_struct.size else None
+
+    def _values(self, kwargs):
+        """依照欄位順序整理要打包的數值"""
+        values = []
+        for field, size, field_type in self.fields:
+            if field_type in ("s", LENGTH_PREFIXED_TYPE):  # 字串處理
+                value = kwargs.get(field, b"")
+                if isinstance(value, str):
+                    # Struct 打包 "Ns" 時會自動截斷並把後續的空字串補為 \0, 否則c++ server無法解析正確資訊
+                    value = value.encode("utf-8")
+            else:  # 整數、浮點數處理
+                value = kwargs.get(field, 0)
+                if not isinstance(value, (int, float)):
+                    raise ValueError(f"Field '{field}' must be of type {field_type}.")
+            if field_type == LENGTH_PREFIXED_TYPE and len(value) >= 1 << (8 * size):
+                raise ValueError(f"Field '{field}' is too long ({len(value)} bytes) for a {size}-byte length prefix.")
+            values.append(value)
+        return values
+
+
+def _decode_variable_value(raw):
+    """不定長度欄位以 utf-8 解碼, 非文字內容保留原始 bytes"""
+    try:
+        return raw.decode("utf-8").rstrip("\x00").strip()
+    except UnicodeDecodeError:
+        return raw
+
+
+# 序列號範圍 1 ~ 0xFFFFFFFF (header 的 seq 為 4 bytes unsigned int), 0 保留給不需要對應回應的封包 (例如封包樣板)
+SEQ_MAX = 0xFFFFFFFF
+_last_seq = 0
+
+
+def next_seq():
+    """取得下一個序列號, 全域遞增, 超過 SEQ_MAX 後從1重新開始 (略過0)"""
+    global _last_seq
+    _last_seq = _last_seq % SEQ_MAX + 1
+    return _last_seq
+
+
+class FieldProjection:
+    """
+    協議的欄位投影, 只解包需要的欄位
+
+    不需要的欄位在 format 中以 pad bytes ("x") 略過, unpack_from 不會為其建立任何物件,
+    例如條件訂閱以 vid 路由時只需要 vid, table_status 的 gmcode 與 status 都不會被解碼
+
+    屬性:
+    - codec (ProtocolCodec): 原協議的編解碼器
+    - field_names (tuple): 投影後的欄位, 依照協議中的順序
+    - struct (struct.Struct): 投影用的 Struct, 長度與原協議相同 (只投影開頭欄位時為開頭欄位的長度)
+    - record_class (type | None): 只包含投影欄位的 ProtocolRecord 子類
+
+    Args:
+        codec (ProtocolCodec): 原協議的編解碼器
+        fields (iterable): 需要的欄位名稱
+        layout (list | None): 投影涵蓋的欄位定義, None 時為協議的所有欄位
+    """
+
+    def __init__(self, codec, fields, layout=None):
+        self.codec = codec
+        byte_order = codec.struct.format[0] if codec.struct.format[:1] in "@=<>!" else "@"
+
+        parts = [byte_order]
+        field_names = []
+        for field, size, field_type in codec.fields if layout is None else layout:
+            format_char = f"{size}s" if field_type == "s" else field_type
+            if field in fields:
+                parts.append(format_char)
+                field_names.append(field)
+            else:
+                parts.append(f"{struct.calcsize(byte_order + format_char)}x")
+        self.struct = struct.Struct("".join(parts))
+        self.field_names = tuple(field_names)
+        self.record_class = make_record_class(codec.name, self.field_names)
+
+        self._interned_indexes = tuple(
+            index for index, field in enumerate(self.field_names)
+            if codec.field_names.index(field) in codec._interned_indexes
+        )
+        self._string_indexes = tuple(
+            index for index, field in enumerate(self.field_names)
+            if codec.field_names.index(field) in codec._string_indexes
+        )
+
+    def decode(self, data, offset=0):
+        """與 ProtocolCodec.decode 相同, 但結果只包含投影的欄位"""
+        if len(data) - offset < self.struct.size:
+            raise ValueError(f"Data size {len(data) - offset} is too small for protocol '{self.codec.name}' ({self.struct.size} bytes)")
+
+        values = list(self.struct.unpack_from(data, offset))
+        for index in self._interned_indexes:
+            values[index] = codec_string_cache.decode(values[index])
+        for index in self._string_indexes:
+            values[index] = values[index].decode("utf-8").strip()
+        if self.record_class is not None:
+            return self.record_class(*values)
+        return dict(zip(self.field_names, values))
+
+
+def pack_header_into(buffer, offset, cmd, size, seq):
+    """將header直接寫入 buffer, size 需為包含header的封包總長度"""
+    HEADER_STRUCT.pack_into(buffer, offset, cmd, size, seq)
+    return offset + HEADER_STRUCT.size
+
+
+def unpack_header_from(data, offset=0):
+    """從 data 的 offset 位置解包header, 返回 (cmd, size, seq)"""
+    return HEADER_STRUCT.unpack_from(data, offset)
+
+
+def build_codecs(protocols):
+    """依照協議定義建立 {protocol_name: ProtocolCodec} 的註冊表"""
+    return {name: ProtocolCodec(name, protocol) for name, protocol in protocols.items()}
+
+
+# 協議編解碼器註冊表, import 時建立一次
+CODECS = build_codecs(PROTOCOLS)
@@ -0,0 +1,138 @@
+import json
+from bisect import bisect_left
+from pathlib import Path
+
+# 解析耗時分佈的區間上限 (微秒), 最後一個區間為超過 1000µs
+DECODE_TIME_BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# 未定義於 PROTOCOLS 且沒有訂閱的指令共用一筆統計, 資料錯位時不會為每個錯誤的 cmd 建立統計
+UNKNOWN_COMMAND = "unknown"
+
+
+class CommandStats:
+    """
+    單一指令的接收統計
+
+    屬性:
+    - frames (int): 接收到的協議數
+    - bytes (int): 接收到的資料量 (含header)
+    - dropped_no_subscriber (int): 沒有任何訂閱者而略過的協議數
+    - dropped_queue_full (int): 訂閱佇列已滿而丟棄 (或被相同 key 取代) 的協議數
+    - parse_failures (int): 解析失敗次數
+    - field_errors (int): 欄位解析失敗但以預設值返回的次數 (例如 JsonField 的內容不是合法 JSON)
+    - decodes (int): 實際解析次數 (延遲解析, 只有訂閱者存取 data 時才會解析)
+    - decode_time (float): 累計解析耗時 (秒)
+    - decode_histogram (list): 解析耗時分佈, 依照 DECODE_TIME_BUCKETS_US 區間計數
+    - queue_high_water (int): 訂閱佇列的最高深度
+    """
+
+    __slots__ = (
+        "cmd", "protocol_name", "frames", "bytes", "dropped_no_subscriber", "dropped_queue_full", "parse_failures",
+        "field_errors", "decodes", "decode_time", "decode_histogram", "queue_high_water",
+    )
+
+    def __init__(self, cmd, protocol_name=None):
+        self.cmd = cmd
+        self.protocol_name = protocol_name
+        self.reset()
+
+    def reset(self):
+        """清除統計"""
+        self.frames = 0
+        self.bytes = 0
+        self.dropped_no_subscriber = 0
+        self.dropped_queue_full = 0
+        self.parse_failures = 0
+        self.field_errors = 0
+        self.decodes = 0
+        self.decode_time = 0.0
+        self.decode_histogram = [0] * (len(DECODE_TIME_BUCKETS_US) + 1)
+        self.queue_high_water = 0
+
+    def record_decode(self, elapsed, ok=True, field_errors=0):
+        """記錄一次解析的耗時 (秒) 與以預設值返回的欄位數"""
+        self.decodes += 1
+        self.field_errors += field_errors
+        self.decode_time += elapsed
+        self.decode_histogram[bisect_left(DECODE_TIME_BUCKETS_US, elapsed * 1_000_000)] += 1
+        if not ok:
+            self.parse_failures += 1
+
+    def to_dict(self):
+        """轉換為可輸出 JSON 的 dict"""
+        labels = [f"<={bound}us" for bound in DECODE_TIME_BUCKETS_US] + [f">{DECODE_TIME_BUCKETS_US[-1]}us"]
+        return {
+            "cmd": hex(self.cmd) if isinstance(self.cmd, int) else self.cmd,
+            "protocol": self.protocol_name,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "dropped_no_subscriber": self.dropped_no_subscriber,
+            "dropped_queue_full": self.dropped_queue_full,
+            "parse_failures": self.parse_failures,
+            "field_errors": self.field_errors,
+            "decodes": self.decodes,
+            "decode_time_total_ms": round(self.decode_time * 1000, 3),
+            "decode_time_avg_us": round(self.decode_time / self.decodes * 1_000_000, 3) if self.decodes else 0.0,
+            "decode_histogram": dict(zip(labels, self.decode_histogram)),
+            "queue_high_water": self.queue_high_water,
+        }
+
+
+class FrameStats:
+    """
+    連線上各指令的接收統計 {cmd(int): CommandStats}
+
+    屬性:
+    - unknown_headers (int): 未定義於 PROTOCOLS 的指令 header 數
+    - rejected_unknown_headers (int): 未知指令的 size 超過 MAX_UNKNOWN_FRAME_SIZE, 視為資料錯位而重新對齊的次數
+
+    方法:
+    - command(cmd, protocol_name=None): 取得指令的統計, 不存在時建立
+    - unknown(): 未知指令共用的統計
+    - snapshot(): 返回所有指令的統計, 依照資料量排序
+    - reset(): 清除所有統計
+    """
+
+    def __init__(self):
+        self._commands = {}
+        self.unknown_headers = 0
+        self.rejected_unknown_headers = 0
+
+    def command(self, cmd, protocol_name=None):
+        """取得指令的統計, 不存在時建立"""
+        stats = self._commands.get(cmd)
+        if stats is None:
+            stats = self._commands[cmd] = CommandStats(cmd, protocol_name)
+        elif protocol_name and stats.protocol_name is None:
+            stats.protocol_name = protocol_name
+        return stats
+
+    def unknown(self):
+        """未知指令共用的統計"""
+        return self.command(UNKNOWN_COMMAND)
+
+    def snapshot(self):
+        """返回有接收過資料的指令統計, 依照資料量由大到小排序"""
+        commands = [stats for stats in self._commands.values() if stats.frames]
+        commands.sort(key=lambda stats: stats.bytes, reverse=True)
+        return [stats.to_dict() for stats in commands]
+
+    def reset(self):
+        """清除所有統計"""
+        for stats in self._commands.values():
+            stats.reset()
+        self.unknown_headers = 0
+        self.rejected_unknown_headers = 0
+
+
+def append_stats_report(path, record):
+    """將一筆統計以 JSON Lines 格式附加到報告檔案
+
+    Args:
+        path (str | Path): 報告檔案路徑, 目錄不存在時自動建立
+        record (dict): 統計內容
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as report:
+        report.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -0,0 +1,70 @@
+from time import perf_counter
+
+from protocols.descriptors import field_errors
+from utils.logger import logger
+
+
+class LazyPacket:
+    """
+    延遲解析的封包, 保存協議本體的原始資料, 第一次存取 data 時才進行解析
+
+    為了相容原本放入佇列的 dict 格式 ({'cmd', 'size', 'seq', 'protocol', 'data'}),
+    提供 get() / [] / in 等 dict 操作, 原本 response.get("data", {}).get(...) 的寫法不需要修改
+
+    - 有解析器的協議: 可取得 'cmd', 'size', 'seq', 'protocol', 'data'
+    - 不需解析 (SKIP_PARSE_CMD) 或解析失敗的協議: 可取得 'cmd', 'size', 'seq', 'raw_body'
+    """
+
+    __slots__ = ("cmd", "size", "seq", "protocol", "raw_body", "_decoder", "_stats", "_data", "_decoded")
+
+    def __init__(self, cmd, size, seq, protocol, raw_body, decoder=None, stats=None):
+        self.cmd = cmd              # hex(cmd)
+        self.size = size
+        self.seq = seq
+        self.protocol = protocol
+        self.raw_body = raw_body    # 協議本體原始資料 (bytes)
+        self._decoder = decoder
+        self._stats = stats         # CommandStats, 記錄解析耗時與失敗次數
+        self._data = None
+        self._decoded = decoder is None
+
+    @property
+    def data(self):
+        """解析後的協議內容, 第一次存取時才解析, 解析失敗或不需解析時為 None"""
+        if not self._decoded:
+            self._decoded = True
+            errors = field_errors.count
+            start = perf_counter()
+            try:
+                self._data = self._decoder(self.raw_body)
+            except Exception as e:
+                logger.warning(f"Failed to parse protocol {self.protocol}: {e}")
+            if self._stats is not None:
+                self._stats.record_decode(perf_counter() - start, self._data is not None, field_errors.count - errors)
+        return self._data
+
+    def keys(self):
+        """返回與原本 dict 格式相同的 key"""
+        if self.data is not None:
+            return ("cmd", "size", "seq", "protocol", "data")
+        return ("cmd", "size", "seq", "raw_body")
+
+    def get(self, key, default=None):
+        if key in self.keys():
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key in self.keys():
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def to_dict(self):
+        """轉換為原本的 dict 格式"""
+        return {key: getattr(self, key) for key in self.keys()}
+
+    def __repr__(self):
+        return repr(self.to_dict())
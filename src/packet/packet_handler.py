@@ -1,27 +1,565 @@
 import asyncio
-import struct
+from functools import partial
 
 from protocols.protocols import HEADER_FORMAT, HEADER_SIZE, PROTOCOLS
-from protocols.descriptors import PROTOCOL_DESCRIPTORS
+from protocols.descriptors import PROTOCOL_DESCRIPTORS, decode_detail_items
+from packet.codec import CODECS, HEADER_STRUCT, next_seq
+from packet.frame_stats import FrameStats
+from packet.lazy_packet import LazyPacket
+from packet.single_flight import SingleFlight
+from packet.subscriber_queue import DEFAULT_QUEUE_MAXSIZE, DEFAULT_QUEUE_POLICY, SubscriberQueue
 from utils.logger import logger
 
 # Define skip commands list at class level
 # 用於跳過不需要解析的指令, 0x030005有點奇怪, 看起來仍是會收到這個指令
 SKIP_PARSE_CMD = [0x030005]
+
+# 重組緩衝區上限, 殘留資料超過此大小視為異常資料並丟棄
+MAX_REASSEMBLY_SIZE = 1024 * 1024
+
+# 單一協議 (含header) 的長度上限, header 的 size 超過此值視為資料錯位
+MAX_FRAME_SIZE = 64 * 1024
+
+# 未定義於 PROTOCOLS 的指令的長度上限, 錯位的資料很容易被當成未知指令,
+# 上限太大時會等待一大段不存在的資料, 把後面正常的協議一起吞掉
+MAX_UNKNOWN_FRAME_SIZE = 4 * 1024
+
+
+class DispatchEntry:
+    """
+    單一指令的分派資訊, 由 PacketHandler 以 int cmd 為 key 建立索引
+
+    屬性:
+    - cmd (int): 協議號
+    - hex_cmd (str): hex(cmd), 預先計算好, 作為封包內的 'cmd' 欄位與佇列 key
+    - protocol_name (str | None): 對應的協議名稱, 未定義於 PROTOCOLS 的指令為 None
+    - protocol (dict | None): 協議定義
+    - skip_parse (bool): 是否跳過解析 (SKIP_PARSE_CMD)
+    - decoder (callable | None): 目前使用的協議本體解析函數, 不需解析的指令為 None
+    - full_decoder (callable | None): 解析完整協議的函數
+    - codec (ProtocolCodec | None): 可做欄位投影的編解碼器, 使用描述器解析的協議為 None
+    - key_codec (ProtocolCodec | None): 只用於解包路由 / 比對欄位 (vid、gmcode 等開頭的固定長度欄位) 的編解碼器,
+      使用描述器解析的協議也有, 其他欄位仍由描述器解析
+    - subscriber_fields (dict): 各訂閱者需要的欄位 {loop_id 或 Subscription: frozenset | None}, None 表示需要完整解析
+    - min_size (int): header 中 size 欄位的合理下限 (含header)
+    - max_size (int): header 中 size 欄位的合理上限 (含header), 固定長度協議與 min_size 相同
+    - subscribers (dict): 訂閱此指令的佇列 {loop_id: Queue}
+    - filtered_by_vid (dict): 有指定桌台的條件訂閱 {vid: [Subscription]}
+    - filtered (list): 沒有指定桌台的條件訂閱 [Subscription]
+    - route_decoder (callable | None): 只解包 vid 的投影解碼器, 用於條件訂閱的路由
+    - channels (list): 此指令的最新值通道 [LatestValueChannel]
+    - stats (CommandStats | None): 此指令的接收統計
+    """
+
+    __slots__ = (
+        "cmd", "hex_cmd", "protocol_name", "protocol", "skip_parse", "decoder", "full_decoder", "codec", "key_codec",
+        "subscriber_fields", "min_size", "max_size", "subscribers", "filtered_by_vid", "filtered",
+        "route_decoder", "channels", "stats",
+    )
+
+    def __init__(self, cmd, protocol_name=None, protocol=None, decoder=None, codec=None,
+                 min_size=HEADER_SIZE, max_size=MAX_FRAME_SIZE, key_codec=None):
+        self.cmd = cmd
+        self.hex_cmd = hex(cmd)
+        self.protocol_name = protocol_name
+        self.protocol = protocol
+        self.skip_parse = cmd in SKIP_PARSE_CMD
+        self.full_decoder = None if self.skip_parse else decoder
+        self.decoder = self.full_decoder
+        self.codec = codec
+        self.key_codec = codec if key_codec is None else key_codec
+        self.subscriber_fields = {}
+        self.min_size = min_size
+        self.max_size = max_size
+        self.subscribers = {}
+        self.filtered_by_vid = {}
+        self.filtered = []
+        self.route_decoder = self.key_decoder("vid")
+        self.channels = []
+        self.stats = None
+
+    @property
+    def has_subscribers(self):
+        """是否有任何訂閱者 (包含條件訂閱與最新值通道)"""
+        return bool(self.subscribers or self.filtered_by_vid or self.filtered or self.channels)
+
+    def add_subscriber(self, loop_id, queue, fields=None):
+        """登記訂閱者與需要的欄位
+
+        同一個循環共用同一個佇列, 只要有一次註冊沒有指定欄位就需要完整解析, 否則取所有指定欄位的聯集
+        """
+        if loop_id in self.subscribers:
+            current = self.subscriber_fields.get(loop_id)
+            fields = None if current is None or fields is None else current | frozenset(fields)
+        elif fields is not None:
+            fields = frozenset(fields)
+        self.subscribers[loop_id] = queue
+        self.subscriber_fields[loop_id] = fields
+        self.update_decoder()
+
+    def remove_subscriber(self, loop_id):
+        """移除訂閱者"""
+        self.subscribers.pop(loop_id, None)
+        self.subscriber_fields.pop(loop_id, None)
+        self.update_decoder()
+
+    def clear_subscribers(self):
+        """移除所有訂閱者"""
+        self.subscribers.clear()
+        self.filtered_by_vid.clear()
+        self.filtered.clear()
+        for channel in self.channels:
+            channel.close()
+        self.channels.clear()
+        self.subscriber_fields.clear()
+        self.decoder = self.full_decoder
+
+    def add_filtered(self, subscription, fields=None):
+        """登記條件訂閱, 有指定桌台時放入 vid 路由索引
+
+        指定欄位時會自動加上條件需要比對的欄位 (vid, gmcode); 有自訂條件 (predicate) 但沒有指定欄位時需要完整解析
+        """
+        if fields is not None:
+            fields = frozenset(fields) | subscription.filter_fields
+        if subscription.vid is None:
+            self.filtered.append(subscription)
+        else:
+            self.filtered_by_vid.setdefault(subscription.vid, []).append(subscription)
+        self.subscriber_fields[subscription] = fields
+        self.update_decoder()
+
+    def remove_filtered(self, subscription):
+        """移除條件訂閱, 不存在時不做任何事"""
+        if subscription.vid is None:
+            if subscription in self.filtered:
+                self.filtered.remove(subscription)
+        else:
+            subscriptions = self.filtered_by_vid.get(subscription.vid, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+            if not subscriptions:
+                self.filtered_by_vid.pop(subscription.vid, None)
+        self.subscriber_fields.pop(subscription, None)
+        self.update_decoder()
+
+    def get_channel(self, key, fields=None):
+        """取得 key 的最新值通道, 不存在時建立; 指定欄位時會自動加上 key 欄位"""
+        if fields is not None:
+            fields = frozenset(fields) | {key}
+        for channel in self.channels:
+            if channel.key == key:
+                current = self.subscriber_fields.get(channel)
+                fields = None if current is None or fields is None else current | fields
+                break
+        else:
+            channel = LatestValueChannel(self.cmd, key, self.key_decoder(key))
+            self.channels.append(channel)
+        self.subscriber_fields[channel] = fields
+        self.update_decoder()
+        return channel
+
+    def remove_channel(self, channel):
+        """移除最新值通道"""
+        if channel in self.channels:
+            self.channels.remove(channel)
+            channel.close()
+        self.subscriber_fields.pop(channel, None)
+        self.update_decoder()
+
+    def iter_filtered(self):
+        """所有條件訂閱"""
+        for subscriptions in self.filtered_by_vid.values():
+            yield from subscriptions
+        yield from self.filtered
+
+    def route(self, packet):
+        """返回條件符合此封包的條件訂閱
+
+        先以 vid 路由索引找出該桌台的訂閱 (只解包 vid 欄位), 再比對 gmcode 與自訂條件,
+        其他桌台的廣播不會喚醒任何條件訂閱者
+        """
+        candidates = self.filtered
+        if self.filtered_by_vid:
+            if self.route_decoder is not None:
+                try:
+                    vid = self.route_decoder(packet.raw_body).get("vid")
+                except Exception as e:
+                    logger.warning(f"Failed to decode vid for routing CMD: {self.hex_cmd}: {e}")
+                    vid = None
+            else:
+                data = packet.data
+                vid = data.get("vid") if data is not None else None
+            by_vid = self.filtered_by_vid.get(vid)
+            if by_vid:
+                candidates = by_vid + candidates if candidates else by_vid
+        return [subscription for subscription in candidates if subscription.matches(packet)]
+
+    def update_decoder(self):
+        """所有訂閱者都有指定欄位時, 改用只解包這些欄位的投影解碼器, 否則使用完整解析"""
+        self.decoder = self.full_decoder
+        if self.full_decoder is None or self.codec is None or not self.subscriber_fields:
+            return
+        fields = frozenset()
+        for subscriber_fields in self.subscriber_fields.values():
+            if subscriber_fields is None:
+                return
+            fields |= subscriber_fields
+        projection = self.codec.projection(fields)
+        if projection is not None:
+            self.decoder = projection.decode
+
+    def accepts_size(self, size):
+        """header 的 size 欄位是否符合此協議的長度"""
+        return self.min_size <= size <= self.max_size
+
+    def key_decoder(self, field):
+        """返回只解包單一欄位的投影解碼函數, 欄位不存在或無法投影時返回 None"""
+        if self.key_codec is None or field not in self.key_codec.field_names:
+            return None
+        projection = self.key_codec.projection((field,))
+        return projection.decode if projection is not None else None
+
+    def field_decoder(self, fields):
+        """返回只解包 fields 的解碼函數, 無法投影時返回完整解析的函數 (不需解析的指令為 None)"""
+        if self.key_codec is not None:
+            projection = self.key_codec.projection(fields)
+            if projection is not None:
+                return projection.decode
+        return self.full_decoder
+
+
+class Subscription:
+    """
+    有條件的訂閱, 只有符合條件的封包會放入 queue
+
+    屬性:
+    - queue (SubscriberQueue): 此訂閱專用的佇列
+    - loop_id (int): 註冊時的事件循環
+    - vid (str | None): 只接收此桌台的封包, 由分派索引以 vid 路由
+    - gmcode (str | None): 只接收此局號的封包
+    - predicate (callable | None): 自訂條件, 以解析後的協議內容呼叫, 返回 True 才放入佇列
+    """
+
+    __slots__ = ("queue", "loop_id", "vid", "gmcode", "predicate")
+
+    def __init__(self, queue, loop_id, vid=None, gmcode=None, predicate=None):
+        self.queue = queue
+        self.loop_id = loop_id
+        self.vid = vid
+        self.gmcode = gmcode
+        self.predicate = predicate
+
+    @property
+    def filter_fields(self):
+        """比對條件需要的欄位"""
+        return frozenset(field for field, value in (("vid", self.vid), ("gmcode", self.gmcode)) if value is not None)
+
+    def matches(self, packet):
+        """封包是否符合 gmcode 與自訂條件 (vid 已由路由索引比對)"""
+        if self.gmcode is None and self.predicate is None:
+            return True
+        data = packet.data
+        if data is None:
+            return False
+        if self.gmcode is not None and data.get("gmcode") != self.gmcode:
+            return False
+        if self.predicate is not None:
+            try:
+                return bool(self.predicate(data))
+            except Exception as e:
+                logger.warning(f"Subscription predicate failed for CMD {packet.cmd}: {e}")
+                return False
+        return True
+
+
+class PacketStream:
+    """
+    將多個指令合併成單一依序的封包串流
+
+    所有指令的條件訂閱共用同一個佇列, 封包依照接收順序放入, 等待者只需要等待一個佇列,
+    不需要為每個指令建立 Task 再以 asyncio.wait 競爭
+
+    可以 `async for packet in stream` 逐筆讀取, 或以 await get(timeout) 讀取單筆;
+    使用 `async with` 時離開區塊自動呼叫 close() 移除訂閱
+
+    屬性:
+    - cmds (tuple): 串流包含的指令 (hex 字串)
+    - queue (SubscriberQueue): 所有指令共用的佇列
+    - closed (bool): 是否已經移除訂閱
+    """
+
+    __slots__ = ("cmds", "queue", "closed", "_subscriptions")
+
+    def __init__(self, queue, subscriptions):
+        self.queue = queue
+        self._subscriptions = subscriptions     # [(DispatchEntry, Subscription)]
+        self.cmds = tuple(entry.hex_cmd for entry, _ in subscriptions)
+        self.closed = False
+
+    async def get(self, timeout=None):
+        """
+        取得下一筆封包
+
+        Args:
+            timeout (float | None): 等待超時時間(秒), 超時拋出 asyncio.TimeoutError
+
+        Returns:
+            LazyPacket: 以 packet["cmd"] 區分指令
+        """
+        # 佇列中已經有封包時直接取出, 不需要等待; 等待超時不會建立 Task (見 SubscriberQueue.get)
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        return await self.queue.get(timeout)
+
+    def close(self):
+        """移除所有指令的訂閱, 重複呼叫不做任何事"""
+        if self.closed:
+            return
+        self.closed = True
+        for entry, subscription in self._subscriptions:
+            entry.remove_filtered(subscription)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        return await self.queue.get()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class PendingRequest:
+    """
+    等待回應的請求, 以序列號 (seq) 對應回應
+
+    屬性:
+    - cmd (int): 預期的回應協議號
+    - seq (int): 請求的序列號
+    - match (dict | None): server 回應的 seq 為0時, 用於比對回應內容的欄位 (例如 {"vid": "BC51"})
+    - match_decoder (callable | None): 只解包 match 欄位的解碼函數
+    - future (asyncio.Future): 收到回應後設置為回應封包
+    """
+
+    __slots__ = ("cmd", "seq", "match", "match_decoder", "future")
+
+    def __init__(self, cmd, seq, match, future, match_decoder=None):
+        self.cmd = cmd
+        self.seq = seq
+        self.match = match
+        self.match_decoder = match_decoder
+        self.future = future
+
+    def matches(self, body):
+        """seq 為0的回應內容是否符合 match 中的所有欄位, 只解包 match 需要的欄位
+
+        Args:
+            body (bytes): 回應的協議本體
+        """
+        if not self.match:
+            return True
+        if self.match_decoder is None:
+            return False
+        try:
+            data = self.match_decoder(body)
+        except Exception as e:
+            logger.warning(f"Failed to decode response for CMD {hex(self.cmd)} while matching pending request: {e}")
+            return False
+        if data is None:
+            return False
+        for field, value in self.match.items():
+            if data.get(field) != value:
+                return False
+        return True
+
+    def resolve(self, packet):
+        """設置回應"""
+        _resolve_future(self.future, packet)
+
+
+class LatestValueChannel:
+    """
+    狀態類廣播的最新值通道, 每個 key (例如 vid) 只保留最新的一筆封包
+
+    table_status 這類狀態廣播只有最新的一筆有意義, 等待者不需要依序消化佇列中過時的狀態:
+    current() 直接取得目前的狀態, next() / wait_for() 等待下一次狀態變化;
+    需要持續追蹤每一次變化的元件 (例如 TableStateCache) 以 add_listener() 登記回呼
+
+    屬性:
+    - cmd (int): 協議號
+    - key (str): 區分狀態的欄位, 例如 "vid"
+    - key_decoder (callable | None): 只解包 key 欄位的投影解碼器, 無法投影時使用解析後的 data
+    """
+
+    __slots__ = ("cmd", "key", "key_decoder", "_values", "_waiters", "_listeners")
+
+    def __init__(self, cmd, key="vid", key_decoder=None):
+        self.cmd = cmd
+        self.key = key
+        self.key_decoder = key_decoder
+        self._values = {}       # 最新的封包 {key: LazyPacket}
+        self._waiters = {}      # 等待下一次變化的 Future {key: [Future]}
+        self._listeners = []    # 每一筆封包都會呼叫的回呼 [callback(key, packet)]
+
+    def publish(self, packet):
+        """更新 key 的最新值, 並喚醒等待此 key 的等待者"""
+        if self.key_decoder is not None:
+            key = self.key_decoder(packet.raw_body).get(self.key)
+        else:
+            data = packet.data
+            key = data.get(self.key) if data is not None else None
+        self._values[key] = packet
+        for listener in self._listeners:
+            try:
+                listener(key, packet)
+            except Exception as e:
+                logger.warning(f"Latest value listener for CMD: {hex(self.cmd)} failed: {e}")
+        for future in self._waiters.pop(key, ()):
+            _resolve_future(future, packet)
+
+    def add_listener(self, callback):
+        """登記在處理器收到每一筆封包時同步呼叫的回呼 callback(key, packet), 回呼不應阻塞"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """移除回呼, 不存在時不做任何事"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def current(self, key):
+        """返回 key 目前的最新封包, 尚未收到時返回 None"""
+        return self._values.get(key)
+
+    def keys(self):
+        """返回已收到狀態的 key"""
+        return tuple(self._values)
+
+    def next_future(self, key):
+        """返回在 key 下一次狀態變化時完成的 Future, 可直接交給 asyncio.wait() 同時等待多個通道, 不需要建立 Task
+
+        Future 的結果是第一筆變化, 之後同一批資料中可能還有更新的值, 完成後應以 current(key) 取得最新值;
+        不再需要時需呼叫 discard() 移除
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, []).append(future)
+        return future
+
+    def discard(self, key, future):
+        """移除尚未完成的等待者, future 為 None 或已完成時不做任何事"""
+        waiters = self._waiters.get(key)
+        if future is None or not waiters or future not in waiters:
+            return
+        waiters.remove(future)
+        if not waiters:
+            del self._waiters[key]
+        future.cancel()
+
+    async def next(self, key, timeout=None):
+        """
+        等待 key 的下一次狀態變化
+
+        Args:
+            key: 例如桌台ID
+            timeout (float | None): 等待超時時間(秒), 超時拋出 asyncio.TimeoutError
+
+        Returns:
+            LazyPacket: 呼叫之後的狀態變化, 同一批資料中有多筆時返回恢復執行當下的最新值
+        """
+        future = self.next_future(key)
+        try:
+            packet = await asyncio.wait_for(future, timeout)
+        finally:
+            self.discard(key, future)
+        return self._values.get(key, packet)
+
+    async def wait_for(self, key, predicate, timeout=None, include_current=False):
+        """
+        等待 key 的狀態符合 predicate
+
+        Args:
+            key: 例如桌台ID
+            predicate (callable): 以解析後的協議內容呼叫, 返回 True 表示符合
+            timeout (float | None): 總等待時間(秒), 超時拋出 asyncio.TimeoutError
+            include_current (bool): 目前的最新值符合時直接返回, False 時只等待之後的變化
+
+        Returns:
+            LazyPacket: 符合條件的封包
+        """
+        if include_current:
+            packet = self.current(key)
+            if packet is not None and packet.data is not None and predicate(packet.data):
+                return packet
+
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            packet = await self.next(key, remaining)
+            if packet.data is not None and predicate(packet.data):
+                return packet
+
+    def close(self):
+        """取消所有等待者並清除最新值"""
+        for waiters in self._waiters.values():
+            for future in waiters:
+                if not future.done():
+                    future.get_loop().call_soon_threadsafe(future.cancel)
+        self._waiters.clear()
+        self._values.clear()
+        self._listeners.clear()
+
+
+def _resolve_future(future, result):
+    """設置 Future 的結果, 處理器與等待者在不同事件循環時透過 call_soon_threadsafe 設置"""
+    loop = future.get_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if loop is running_loop:
+        _set_future_result(future, result)
+    else:
+        loop.call_soon_threadsafe(_set_future_result, future, result)
+
+
+def _set_future_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def normalize_cmd(cmd):
+    """將 hex 字串或 int 的指令統一轉換成 int"""
+    if isinstance(cmd, str):
+        return int(cmd, 16)
+    return cmd
+
+
 class PacketHandler:
     """
     PacketHandler 負責處理封包的打包和解包。
 
     方法:
-    - pack_header(cmd, size, seq): 打包封包的header。
+    - pack_header(cmd, size, seq=None): 打包封包的header, 未指定 seq 時自動分配遞增的序列號。
     - unpack_header(header_data): 解包封包的header。
     - pack_data(protocol_name, **kwargs): 根據協議名稱打包封包數據。
     - unpack_data(protocol_name, data): 根據協議名稱解包封包數據。
     - start_processor(): 啟動封包處理器。
     - stop_processor(): 停止封包處理器。
     - _process_packets(): 持續處理接收到的封包。
-    - register_handler(cmd): 註冊一個命令處理器，返回與當前循環綁定的隊列。
+    - register_handler(cmd, fields=None, vid=None, gmcode=None, predicate=None): 註冊一個命令處理器，返回與當前循環綁定的隊列, 可指定只需要的欄位與過濾條件。
+    - unregister_handler(cmd, queue): 移除以條件註冊的佇列。
+    - stream(*cmds, vid=None, gmcode=None, filter=None, fields=None): 將多個指令合併成單一依序的封包串流。
+    - latest_channel(cmd, key="vid", fields=None): 取得只保留每個 key 最新封包的通道。
     - wait_for_response(cmd, timeout=30): 等待特定指令的回應。
+    - expect_response(cmd, seq, match=None): 登記等待中的請求, 返回收到對應回應時完成的 Future。
+    - cancel_pending(cmd, seq): 移除等待中的請求。
+    - get_frame_stats(): 返回各指令的接收統計 (協議數、資料量、解析耗時分佈、略過數、解析失敗數、佇列最高深度)。
     - unpack_variable_data(data, offset=53, count=0): 解析不定長度的數據字段, 目前用於 settle_resp 協議的 data 字段。
     """
     
@@ -29,6 +567,9 @@ class PacketHandler:
         self.HEADER_FORMAT = HEADER_FORMAT
         self.HEADER_SIZE = HEADER_SIZE
         self.PROTOCOLS = PROTOCOLS
+        self.CODECS = CODECS        # 預先編譯好的協議編解碼器 {protocol_name: ProtocolCodec}
+        self.frame_stats = FrameStats()     # 各指令的接收統計
+        self._dispatch = self._build_dispatch_index()   # 指令分派索引 {cmd(int): DispatchEntry}
 
         # 新增屬性
         self.ws_client = ws_client
@@ -36,13 +577,117 @@ class PacketHandler:
         self._loop_queues = {}      # 格式: {loop_id: {cmd: Queue}}
         self.running = True         # 處理器運行狀態
         self.processor_task = None  # 處理器任務
+        self._pending = {}          # 等待回應的請求 {回應cmd(int): {seq: PendingRequest}}
+        self.single_flight = SingleFlight()     # 合併同時進行的相同請求, key 為 (cmd, 請求欄位)
+
+        # 封包重組緩衝區: 協議被拆在多個 WebSocket 訊息時, 保留尚未完整的資料到下一次接收
+        self._recv_buffer = bytearray()
+        self.carried_bytes = 0      # 累計保留到下一次接收的資料量 (bytes)
+        self.carry_events = 0       # 發生資料保留的次數
+        self.dropped_bytes = 0      # 因緩衝區超過上限而丟棄的資料量 (bytes)
+        self.resync_events = 0      # header 不合理而重新對齊的次數
+        self.resync_skipped_bytes = 0   # 重新對齊時略過的資料量 (bytes)
+
+    def _build_dispatch_index(self):
+        """依照 PROTOCOLS 建立 {cmd(int): DispatchEntry} 的分派索引, 同一個 cmd 以先定義者為準
+
+        每個協議同時記錄合理的封包長度: 固定長度協議必須剛好是 header + 協議本體,
+        有不定長度資料的協議 (描述器解析、長度為0的欄位、SKIP_PARSE_CMD 後面接的投注資料) 至少要有固定部分
+        """
+        index = {}
+        for protocol_name, protocol in self.PROTOCOLS.items():
+            cmd = protocol["cmd"]
+            if cmd in index:
+                continue
+            min_size = self.HEADER_SIZE + self.CODECS[protocol_name].size
+            variable = (
+                protocol_name in PROTOCOL_DESCRIPTORS
+                or cmd in SKIP_PARSE_CMD
+                or self.CODECS[protocol_name].variable
+            )
+            index[cmd] = DispatchEntry(
+                cmd, protocol_name, protocol, partial(self.unpack_data, protocol_name),
+                codec=None if protocol_name in PROTOCOL_DESCRIPTORS else self.CODECS[protocol_name],
+                min_size=min_size, max_size=MAX_FRAME_SIZE if variable else min_size,
+                key_codec=self.CODECS[protocol_name],
+            )
+            index[cmd].stats = self.frame_stats.command(cmd, protocol_name)
+        return index
+
+    def _is_plausible_header(self, cmd, size, known_only=False):
+        """檢查 header 是否合理
+
+        Args:
+            cmd (int): 協議號
+            size (int): 協議總長度 (含header)
+            known_only (bool): 是否只接受 PROTOCOLS 中定義的協議, 重新對齊時使用以降低誤判
+
+        Returns:
+            bool: 已知協議的長度符合定義, 或未知協議的長度在 HEADER_SIZE ~ MAX_UNKNOWN_FRAME_SIZE 之間
+        """
+        entry = self._dispatch.get(cmd)
+        if entry is not None and entry.protocol is not None:
+            return entry.accepts_size(size)
+        if known_only:
+            return False
+
+        # 未知指令的 header 記錄在統計中, 數量異常時通常表示資料錯位
+        self.frame_stats.unknown_headers += 1
+        if not self.HEADER_SIZE <= size <= MAX_UNKNOWN_FRAME_SIZE:
+            self.frame_stats.rejected_unknown_headers += 1
+            return False
+        return True
+
+    def _resync(self, view, position):
+        """從 position 之後逐 byte 尋找下一個合理的 header
 
-    def pack_header(self, cmd, size, seq):
+        Args:
+            view (memoryview): 接收到的資料
+            position (int): 不合理的 header 位置
+
+        Returns:
+            int: 下一個合理 header 的位置, 找不到時返回最後一個可能是不完整 header 的位置
+        """
+        data_length = len(view)
+        last_start = data_length - self.HEADER_SIZE
+        candidate = position + 1
+        while candidate <= last_start:
+            cmd, size, _ = HEADER_STRUCT.unpack_from(view, candidate)
+            if self._is_plausible_header(cmd, size, known_only=True):
+                break
+            candidate += 1
+        # 找不到時停在最後不足一個 header 的資料, 保留到下一次接收 (可能是下一個 header 的前段)
+
+        self.resync_events += 1
+        self.resync_skipped_bytes += candidate - position
+        logger.warning(f"Invalid frame header at offset {position}, resynchronised after skipping {candidate - position} bytes")
+        return candidate
+
+    def _get_dispatch_entry(self, cmd):
+        """取得指令的分派資訊, 未定義於 PROTOCOLS 的指令會建立一個不解析的項目"""
+        cmd = normalize_cmd(cmd)
+        entry = self._dispatch.get(cmd)
+        if entry is None:
+            entry = self._dispatch[cmd] = DispatchEntry(cmd)
+            entry.stats = self.frame_stats.command(cmd)
+        return entry
+
+    def _remove_loop(self, loop_id):
+        """移除某個循環的所有佇列, 同時從分派索引中移除訂閱"""
+        self._loop_queues.pop(loop_id, None)
+        for entry in self._dispatch.values():
+            if loop_id in entry.subscribers:
+                entry.remove_subscriber(loop_id)
+            for subscription in list(entry.iter_filtered()):
+                if subscription.loop_id == loop_id:
+                    entry.remove_filtered(subscription)
+
+    def pack_header(self, cmd, size, seq=None):
         """打包header
         參數:
         - cmd (int): 協議號
         - size (int): 封包大小
-        - seq (int): 序列號, 皆為0
+        - seq (int | None): 序列號, None 時自動分配遞增的序列號 (next_seq), 不需要對應回應的封包可傳入0
 
         返回:
         - bytes: 打包後的header。
@@ -53,26 +698,30 @@ class PacketHandler:
         else:
             pass
         
+        if seq is None:
+            seq = next_seq()
+
         size = size + self.HEADER_SIZE # 封包資料大小加上header大小 (header size 固定 12 bytes)
-        return struct.pack(self.HEADER_FORMAT, cmd, size, seq)
+        return HEADER_STRUCT.pack(cmd, size, seq)
 
-    def unpack_header(self, header_data):
+    def unpack_header(self, header_data, offset=0):
         """
         解包封包的header。
 
         參數:
-        - header_data (bytes): header數據。
+        - header_data (bytes | memoryview): header數據, 或包含header的整段接收資料。
+        - offset (int): header起始位置, 預設為0。
 
         返回:
         - tuple: 解包後的header數據。分別會return cmd, size, seq。
         """
-        if len(header_data) != self.HEADER_SIZE:
-            raise ValueError(f"Invalid header size: expected {self.HEADER_SIZE}, got {len(header_data)}")
-        # struct.unpack() 返回的是一個tuple, python標準庫中用來處理二進制數據的函數
-        # 這裡的HEADER_FORMAT是一個字符串, 用來定義如何解讀binary data, 數值應為">III"
+        if len(header_data) - offset < self.HEADER_SIZE:
+            raise ValueError(f"Invalid header size: expected {self.HEADER_SIZE}, got {len(header_data) - offset}")
+        # HEADER_STRUCT 是依照 HEADER_FORMAT (">III") 預先編譯好的 struct.Struct
         # 這裡的header_data是一個bytes對象, 要解析的binary data
+        # unpack_from 直接從 offset 位置讀取, 不需要先切割出header
         # 會return一個tuple, 分別為cmd, size, seq
-        unpacked_data = struct.unpack(self.HEADER_FORMAT, header_data)
+        unpacked_data = HEADER_STRUCT.unpack_from(header_data, offset)
         # print(f"DEBUG unpack_header (Hex): {(unpacked_data[0].to_bytes(4, byteorder='big')).hex()}")
         # print(f"DEBUG unpack_header: {unpacked_data}")
         return unpacked_data
@@ -88,62 +737,26 @@ class PacketHandler:
         返回:
         - bytes: 打包後的封包數據。
         """
-        protocol = self.PROTOCOLS[protocol_name]
-        format_string = protocol["format"]
-        values = []
-        for field, size, field_type in protocol["fields"]:
-            value = kwargs.get(field, b"\x00" * size if field_type == "s" else 0)
-            if field_type == "s":  # 字串處理
-                value = value.encode("utf-8").ljust(size, b"\x00")[:size]  # 把後續的空字串補為 \0, 否則c++ server無法解析正確資訊
-            elif field_type in ("I", "Q", "B", "H"):  # 整數、浮點數處理
-                if not isinstance(value, (int, float)):
-                    raise ValueError(f"Field '{field}' must be of type {field_type}.")
-            values.append(value)
-
-        # print(f"DEBUG - format_string: {format_string}")
-        # print(f"DEBUG - values: {[repr(v) for v in values]}")
-
-        try:
-            return struct.pack(format_string, *values)
-        except struct.error as e:
-            raise ValueError(f"Error packing data with format '{format_string}': {e}")
+        return self.CODECS[protocol_name].encode(**kwargs)
 
-    # HACK: 新增解析不定長度的封包資料, 用於解析 settle_resp 協議 20250314
-    def unpack_data(self, protocol_name, data):
+    def unpack_data(self, protocol_name, data, offset=0):
         """
         根據協議名稱解包封包數據
         參數:
         - protocol_name (str): 協議名稱。
-        - data (bytes): 封包數據。 傳入的封包資料預期已經切割掉header的部分(12 bytes), 只剩下封包資料本體
+        - data (bytes | memoryview): 封包數據。 傳入的封包資料預期已經切割掉header的部分(12 bytes), 只剩下封包資料本體
+        - offset (int): 封包資料本體在 data 中的起始位置, 預設為0。
 
         返回:
-        - dict: 解包後的封包數據。
+        - ProtocolRecord | dict: 解包後的封包數據, 以 __slots__ 儲存欄位的協議記錄 (如 TableStatus), 相容 dict 的 get() 取值。
         """
-        protocol = self.PROTOCOLS[protocol_name]
+        # 有描述器的協議 (需要結構化解析, 例如 settle_resp 的下注詳情) 使用描述器, 解析失敗時直接拋出例外, 不再以 Struct 重新解析
+        descriptor = PROTOCOL_DESCRIPTORS.get(protocol_name)
+        if descriptor is not None:
+            return descriptor.parse(data, offset)
 
-        if protocol_name in PROTOCOL_DESCRIPTORS:
-            try:
-                descriptor = PROTOCOL_DESCRIPTORS[protocol_name]
-                return descriptor.parse(data)
-            except Exception as e:
-                # 如果描述器解析失敗，嘗試使用傳統方式
-                logger.error(f"Error parsing protocol {protocol_name} with descriptor: {e}")
-                
-        # 一般協議處理
-        format_string = protocol["format"]
-        if len(data) < struct.calcsize(format_string):
-            raise ValueError(f"Data size {len(data)} is too small for format '{format_string}'")
-        
-        unpacked_data = struct.unpack(format_string, data)
-        result = {}
-        # 遊歷所有fields, 並將解析後的資料放入result dict
-        # unpacked_data是一個tuple, 內容是解析後的資料
-        # 最後的dict結構為: {field: value}
-        for (field, size, field_type), value in zip(protocol["fields"], unpacked_data):
-            if field_type == "s":   # 針對解析出來的字串做處理, 去掉前後的空白字元
-                value = value.decode("utf-8").strip()
-            result[field] = value
-        return result
+        # 一般協議處理, 使用預先編譯好的編解碼器解包 (包含不定長度欄位)
+        return self.CODECS[protocol_name].decode(data, offset)
     
     # 新增封包處理相關方法
     async def start_processor(self):
@@ -196,6 +809,13 @@ class PacketHandler:
         # 清理隊列引用
         self.cmd_queues.clear()
         self._loop_queues.clear()
+        for entry in self._dispatch.values():
+            entry.clear_subscribers()
+        for pending_requests in self._pending.values():
+            for pending in pending_requests.values():
+                pending.future.cancel()
+        self._pending.clear()
+        self._recv_buffer.clear()
         
         self.processor_task = None
         self.cleanup_task = None
@@ -219,116 +839,267 @@ class PacketHandler:
                     break
                 
                 # 1. 接收原始資料
-                raw_data = await self.ws_client.recv_raw()
+                try:
+                    raw_data = await self.ws_client.recv_raw()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # 只有連線層的錯誤需要等待後重試
+                    logger.error(f"Receive error: {str(e)}")
+                    await asyncio.sleep(1)
+                    continue
                 if not raw_data:
                     continue
+
+                # 1.1 如果上一次有殘留未完整的協議, 接在殘留資料後面一起解析
+                if self._recv_buffer:
+                    self._recv_buffer += raw_data
+                    buffer = self._recv_buffer
+                else:
+                    buffer = raw_data   # 沒有殘留資料時直接解析, 不需要複製
                 
                 # 2. 解析所有協議 (使用指針移動方式)
-                current_position = 0
-                while current_position < len(raw_data):
-                    # 2.1 解析標頭 檢查是否有足夠的資料解析header
-                    if current_position + self.HEADER_SIZE > len(raw_data):
-                        break # 等待更多資料
-
-                    # 這邊用slicing語法, 直接切割出整個raw data的前12 bytes(header)
-                    # slicing 語法: [start:stop:step]
-                    # start: 起始位置, stop: 結束位置, step: 步長
-                    # 如果 start 為空, 則默認為 0
-                    # 如果 stop 為空, 則默認為最後一個元素
-                    # 如果 step 為空, 則默認為 1
-                    header = self.unpack_header(raw_data[current_position:current_position + self.HEADER_SIZE])
-                    cmd, size, seq = header
-                    # 減少debug log數量, 暫時註解掉
-                    # log_and_print(f"Header parsed - CMD: {hex(cmd)}, Size: {size}, Seq: {seq}", 
-                    #             level=logging.DEBUG)
-
-                    # 2.2 取得當前協議的內容
-                    body_start = current_position + self.HEADER_SIZE    # header結束位置, 實際封包資料起始點
-                    body_end = current_position + size                  # 封包資料結束位置, 透過解析header得到的協議size取得
-                    # 假如封包資料結束的位置大於raw data的長度, 則跳出迴圈
-                    if body_end > len(raw_data):
-                        break
-
-                    # 再次slicing一次, 取得該協議對應的封包本體內容    
-                    body = raw_data[body_start:body_end]
-
-                    # 2.3 尋找對應協議並解析
-                    parsed_data = None
-                    for protocol_name, protocol in self.PROTOCOLS.items():  # 遊歷所有protocol, 取出protocol_name和其對應內容
-                        if protocol['cmd'] == cmd:
-                            # log_and_print(f"SKIP_CMD type : {type(SKIP_PARSE_CMD)}", level=logging.DEBUG)
-
-                            # 如果該協議在SKIP_PARSE_CMD中, 則跳過解析, 原先預期把心跳包放進去, 但因為資料型態轉換上碰到一點問題, 所以只放0x030005下注協議
-                            # 0x030005下注協議有點奇怪, 看起來實作時模擬的client端仍會收到這個協議, 其實預期應該是不會收到
-                            if protocol['cmd'] in SKIP_PARSE_CMD:
-                                logger.debug(f"Skipping parsing for CMD: {hex(cmd)}")
-                                continue
-                            try:
-                                body_data = self.unpack_data(protocol_name, body)
-                                parsed_data = {
-                                    'cmd': hex(cmd),
-                                    'size': size,
-                                    'seq': seq,
-                                    'protocol': protocol_name,
-                                    'data': body_data
-                                }
-                                # 減少debug log數量, 暫時註解掉
-                                # logger.debug(f"Parsed protocol: {protocol_name}, CMD: {hex(cmd)}")
-                                # logger.debug(f"Parsed data: {parsed_data}")
-                                break
-                            except Exception as e:
-                                logger.warning(f"Failed to parse protocol {protocol_name}: {e}")
-                                continue
-
-                    # 2.4 如果有對應的佇列，放入解析結果
-                    # logger.debug(f"Queues: {self.cmd_queues}")
-                    if hex(cmd) in self.cmd_queues:
-                        # logger.debug (f"cmd: {cmd}")
-                        # 減少debug log數量, 暫時註解掉
-                        # logger.debug (f"put hex(cmd) in self.cmd_queues: {hex(cmd)}")
-                        # logger.debug (f"self.cmd_queues: {self.cmd_queues}")
-
-                        # 向所有循環的隊列發送數據
-                        data_to_queue = parsed_data or {
-                            'cmd': hex(cmd),
-                            'size': size,
-                            'seq': seq,
-                            'raw_body': body_data
-                        }
-
-                        # # 打印實際分發前的數據
-                        # logger.debug(f"Preparing to dispatch data for CMD: {hex(cmd)}")
-                        # logger.debug(f"Current loops: {list(self._loop_queues.keys())}")
-    
-                        # # 打印每個循環的隊列情況
-                        # for loop_id, loop_queues in self._loop_queues.items():
-                        #     logger.debug(f"Loop {loop_id} has commands: {list(loop_queues.keys())}")
-
-                        dispatch_count = 0
-                        for loop_id, loop_queues in self._loop_queues.items():
-                            if hex(cmd) in loop_queues:
-                                try:
-                                    await loop_queues[hex(cmd)].put(data_to_queue)
-                                    dispatch_count += 1
-                                except Exception as e:
-                                    logger.warning(f"Failed to dispatch to loop {loop_id}: {e}")
-                        
-                        if dispatch_count > 0:
-                            logger.debug(f"Dispatched data for CMD: {hex(cmd)} to {dispatch_count} loops")
-                        else:
-                            logger.warning(f"No active loops for CMD: {hex(cmd)}")
-
-                    # 2.5 移動到下一個協議
-                    current_position += size
-                    # 減少debug log數量, 暫時註解掉
-                    # log_and_print(f"Moving to next protocol position: {current_position}", 
-                    #             level=logging.DEBUG)
+                # 以 memoryview 操作接收到的資料, 切割header和本體時不會複製bytes
+                view = memoryview(buffer)
+                try:
+                    consumed = await self._dispatch_frames(view)
+                finally:
+                    # 必須先釋放視圖, bytearray 才能調整大小
+                    view.release()
+
+                # 3. 保留尚未完整的協議資料, 等待下一次接收
+                self._carry_remaining(buffer, consumed)
 
             except Exception as e:
+                # 解析錯誤只丟棄目前的緩衝資料, 不暫停接收, 避免佇列與系統緩衝區堆積
                 logger.error(f"Packet processing error: {str(e)}")
                 import traceback
                 logger.error(f"Traceback: {traceback.format_exc()}")
-                await asyncio.sleep(1)
+                self._recv_buffer.clear()
+
+    def _carry_remaining(self, buffer, consumed):
+        """將 buffer 中 consumed 之後尚未完整的資料保留到重組緩衝區
+
+        Args:
+            buffer (bytes | bytearray): 本次解析的資料, 可能就是重組緩衝區本身
+            consumed (int): 已經完整解析的資料長度
+        """
+        remaining = len(buffer) - consumed
+        if buffer is self._recv_buffer:
+            # 直接刪除已處理的前段資料 (compaction), bytearray 刪除前段不需要搬移整段資料
+            del self._recv_buffer[:consumed]
+        elif remaining:
+            self._recv_buffer += buffer[consumed:]
+
+        if not remaining:
+            return
+
+        self.carried_bytes += remaining
+        self.carry_events += 1
+
+        # 避免異常的 size 欄位讓緩衝區無限制成長
+        if len(self._recv_buffer) > MAX_REASSEMBLY_SIZE:
+            logger.error(f"Reassembly buffer exceeded {MAX_REASSEMBLY_SIZE} bytes, dropping {len(self._recv_buffer)} bytes")
+            self.dropped_bytes += len(self._recv_buffer)
+            self._recv_buffer.clear()
+
+    async def _dispatch_frames(self, view):
+        """解析 view 中所有完整的協議並分派到訂閱的佇列
+
+        Args:
+            view (memoryview): 接收到的資料 (包含上一次殘留的資料)
+
+        Returns:
+            int: 已經完整解析的資料長度, 之後的資料為不完整的協議, 需等待更多資料
+        """
+        data_length = len(view)
+        current_position = 0
+        while current_position < data_length:
+            # 2.1 解析標頭 檢查是否有足夠的資料解析header
+            if current_position + self.HEADER_SIZE > data_length:
+                break # 等待更多資料
+
+            # 直接從 current_position 位置解析header (12 bytes), 不需要先slicing出header
+            cmd, size, seq = self.unpack_header(view, current_position)
+
+            # header 的 size 與協議定義不符 (包含小於header的 size, 會讓指針無法前進), 表示資料錯位,
+            # 重新對齊到下一個合理的 header, 不丟棄後面的協議
+            if not self._is_plausible_header(cmd, size):
+                current_position = self._resync(view, current_position)
+                continue
+            # 減少debug log數量, 暫時註解掉
+            # log_and_print(f"Header parsed - CMD: {hex(cmd)}, Size: {size}, Seq: {seq}", 
+            #             level=logging.DEBUG)
+
+            # 2.2 取得當前協議的內容
+            body_start = current_position + self.HEADER_SIZE    # header結束位置, 實際封包資料起始點
+            body_end = current_position + size                  # 封包資料結束位置, 透過解析header得到的協議size取得
+            # 假如封包資料結束的位置大於raw data的長度, 則跳出迴圈, 等待更多資料
+            if body_end > data_length:
+                break
+
+            # memoryview 的 slicing 不會複製資料, 只是該協議封包本體的視圖
+            with view[body_start:body_end] as body:
+                await self._handle_frame(cmd, size, seq, body)
+
+            # 2.5 移動到下一個協議
+            current_position += size
+            # 減少debug log數量, 暫時註解掉
+            # log_and_print(f"Moving to next protocol position: {current_position}", 
+            #             level=logging.DEBUG)
+
+        return current_position
+
+    async def _handle_frame(self, cmd, size, seq, body):
+        """將單一協議包裝成延遲解析的封包, 放入訂閱的佇列
+
+        沒有任何佇列訂閱的協議直接略過, 不做任何解析 (大部分其他桌台的廣播都屬於這種情況)
+
+        Args:
+            cmd (int): 協議號
+            size (int): 協議總長度 (含header)
+            seq (int): 序列號
+            body (memoryview): 協議本體
+        """
+        # 2.3 透過分派索引取得對應協議, 沒有訂閱者則不解析直接略過
+        entry = self._dispatch.get(cmd)
+        stats = entry.stats if entry is not None else self.frame_stats.unknown()
+        stats.frames += 1
+        stats.bytes += size
+        if entry is None:
+            stats.dropped_no_subscriber += 1
+            return
+        pending_requests = self._pending.get(cmd)
+        if not entry.has_subscribers and not pending_requests:
+            stats.dropped_no_subscriber += 1
+            return
+
+        # 2.4 放入佇列的資料需要實體化 (bytes), 避免持有整段接收資料的視圖
+        raw_body = bytes(body)
+
+        # 等待此回應的請求以 seq 對應, 只有 seq 為0的回應才解包 match 欄位比對
+        pending = self._take_pending(pending_requests, seq, raw_body) if pending_requests else None
+        if pending is None and not entry.has_subscribers:
+            stats.dropped_no_subscriber += 1
+            return
+
+        if entry.skip_parse:
+            # 如果該協議在SKIP_PARSE_CMD中, 則跳過解析, 原先預期把心跳包放進去, 但因為資料型態轉換上碰到一點問題, 所以只放0x030005下注協議
+            # 0x030005下注協議有點奇怪, 看起來實作時模擬的client端仍會收到這個協議, 其實預期應該是不會收到
+            logger.debug(f"Skipping parsing for CMD: {entry.hex_cmd}")
+
+        # 實際解析延遲到訂閱者第一次存取 data 時才進行, 多個循環共用同一個封包只會解析一次
+        # 對應到請求時使用完整解析, 請求的回應需要所有欄位
+        decoder = entry.full_decoder if pending is not None else entry.decoder
+        packet = LazyPacket(entry.hex_cmd, size, seq, entry.protocol_name, raw_body, decoder, stats)
+        if pending is not None:
+            pending.resolve(packet)
+
+        # 最新值通道只更新該 key 的最新封包, 不會累積
+        for channel in entry.channels:
+            channel.publish(packet)
+
+        # 向所有循環的隊列發送數據, 條件訂閱只放入條件符合的佇列
+        targets = list(entry.subscribers.items())
+        if entry.filtered_by_vid or entry.filtered:
+            targets.extend((subscription.loop_id, subscription.queue) for subscription in entry.route(packet))
+
+        dispatch_count = 0
+        for loop_id, queue in targets:
+            try:
+                # 有上限的佇列已滿時依照 policy 丟棄或取代封包, 返回丟棄數
+                dropped = await queue.put(packet)
+                if dropped:
+                    stats.dropped_queue_full += dropped
+                dispatch_count += 1
+                if queue.qsize() > stats.queue_high_water:
+                    stats.queue_high_water = queue.qsize()
+            except Exception as e:
+                logger.warning(f"Failed to dispatch to loop {loop_id}: {e}")
+
+        if dispatch_count > 0:
+            logger.debug(f"Dispatched data for CMD: {entry.hex_cmd} to {dispatch_count} loops")
+
+    def _take_pending(self, pending_requests, seq, body):
+        """找出並移除此回應對應的等待中請求
+
+        回應有 seq 時只以 seq 對應, 對應不到 (例如已經逾時的請求遲到的回應) 時不會交給其他請求;
+        server 回應的 seq 為0 (沒有回傳請求的序列號) 時, 依照登記順序找第一個 match 欄位符合的請求
+
+        Args:
+            pending_requests (dict): 該回應協議等待中的請求 {seq: PendingRequest}
+            seq (int): 回應header中的序列號
+            body (bytes): 回應的協議本體
+
+        Returns:
+            PendingRequest | None: 對應的請求, 沒有對應時返回 None, 回應照一般訂閱分派
+        """
+        if seq:
+            pending = pending_requests.pop(seq, None)
+        else:
+            pending = None
+            for candidate_seq, candidate in pending_requests.items():
+                if candidate.matches(body):
+                    pending = pending_requests.pop(candidate_seq)
+                    break
+
+        if pending is not None and not pending_requests:
+            self._pending.pop(pending.cmd, None)
+        return pending
+
+    def get_frame_stats(self):
+        """
+        返回連線的接收統計
+
+        返回:
+        - dict: {"connection": 重組 / 重新對齊等連線層的計數, "commands": 各指令的統計 (依照資料量排序)}
+        """
+        return {
+            "connection": {
+                "carried_bytes": self.carried_bytes,
+                "carry_events": self.carry_events,
+                "dropped_bytes": self.dropped_bytes,
+                "resync_events": self.resync_events,
+                "resync_skipped_bytes": self.resync_skipped_bytes,
+                "unknown_headers": self.frame_stats.unknown_headers,
+                "rejected_unknown_headers": self.frame_stats.rejected_unknown_headers,
+            },
+            "commands": self.frame_stats.snapshot(),
+        }
+
+    def reset_frame_stats(self):
+        """清除各指令的接收統計"""
+        self.frame_stats.reset()
+
+    def expect_response(self, cmd, seq, match=None):
+        """
+        登記等待回應的請求, 需在送出請求前呼叫, 避免回應比登記先到
+
+        參數:
+        - cmd (int | str): 預期的回應協議號
+        - seq (int): 請求封包header中的序列號
+        - match (dict | None): server 回應的 seq 為0時用於比對的欄位, 例如 {"vid": table_id}
+
+        返回:
+        - asyncio.Future: 收到回應時設置為回應封包, 等待結束後需呼叫 cancel_pending() 移除
+        """
+        entry = self._get_dispatch_entry(cmd)
+        match_decoder = entry.field_decoder(match) if match else None
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(entry.cmd, {})[seq] = PendingRequest(entry.cmd, seq, match, future, match_decoder)
+        return future
+
+    def cancel_pending(self, cmd, seq):
+        """移除等待中的請求 (回應已收到或等待逾時), 請求不存在時不做任何事"""
+        cmd = normalize_cmd(cmd)
+        pending_requests = self._pending.get(cmd)
+        if not pending_requests:
+            return
+        pending = pending_requests.pop(seq, None)
+        if pending is not None and not pending.future.done():
+            pending.future.cancel()
+        if not pending_requests:
+            self._pending.pop(cmd, None)
 
     # HACK: 嘗試處理event loop binding問題, 待觀察是否有其他問題 20250307
     async def _periodic_cleanup(self):
@@ -357,7 +1128,7 @@ class PacketHandler:
                                     break
                             
                             if not is_active:
-                                del self._loop_queues[loop_id]
+                                self._remove_loop(loop_id)
                                 removed_loops.append(loop_id)
                         except Exception:
                             pass
@@ -370,8 +1141,28 @@ class PacketHandler:
             except Exception as e:
                 logger.error(f"Error in periodic cleanup: {e}")
 
-    async def register_handler(self, cmd):
-        """註冊一個命令處理器，返回與當前循環綁定的隊列"""
+    async def register_handler(self, cmd, fields=None, vid=None, gmcode=None, predicate=None,
+                               maxsize=DEFAULT_QUEUE_MAXSIZE, policy=DEFAULT_QUEUE_POLICY, conflate_key=None):
+        """註冊一個命令處理器，返回與當前循環綁定的隊列
+
+        有指定條件 (vid / gmcode / predicate) 時建立專用的佇列, 只放入條件符合的封包,
+        使用完畢後需呼叫 unregister_handler() 移除; 沒有條件時返回同一循環共用的佇列
+
+        Args:
+            cmd: 指令碼 (hex 字串或 int)
+            fields (iterable | None): 只需要的欄位, 例如 ("vid", "status", "gmcode"),
+                同一指令的所有訂閱者都有指定欄位時, 只解包這些欄位; None 表示需要完整解析
+            vid (str | None): 只接收此桌台的封包
+            gmcode (str | None): 只接收此局號的封包
+            predicate (callable | None): 自訂條件, 以解析後的協議內容呼叫, 例如 lambda data: data.get("status") == 1
+            maxsize (int): 佇列上限, 0 表示不限制
+            policy (str): 佇列已滿時的處理方式 (block / drop_oldest / drop_newest / conflate), 見 packet.subscriber_queue
+            conflate_key (callable | None): policy 為 conflate 時的 key 函數, 例如 conflate_by_field("vid")
+            同一循環共用的佇列以第一次註冊時的 maxsize / policy 建立
+
+        Returns:
+            SubscriberQueue: 與當前循環綁定的隊列 (asyncio.Queue 子類)
+        """
         # HACK: 嘗試修復當前event loop綁定問題 20250307
         current_loop = asyncio.get_running_loop()
         loop_id = id(current_loop)
@@ -381,10 +1172,22 @@ class PacketHandler:
         # 初始化此循環的字典
         if loop_id not in self._loop_queues:
             self._loop_queues[loop_id] = {}
+
+        # 不論傳入 hex 字串或 int, 統一以 hex(cmd) 作為佇列 key
+        entry = self._get_dispatch_entry(cmd)
+        cmd = entry.hex_cmd
+        if fields is not None and entry.codec is not None:
+            entry.codec.projection(fields)  # 提前檢查欄位名稱, 錯誤的欄位在註冊時就拋出 ValueError
+
+        if vid is not None or gmcode is not None or predicate is not None:
+            subscription = Subscription(SubscriberQueue(maxsize, policy, conflate_key), loop_id, vid, gmcode, predicate)
+            entry.add_filtered(subscription, fields)
+            return subscription.queue
         
-        # 為這個循環創建命令隊列
+        # 為這個循環創建命令隊列, 並登記到分派索引的訂閱者中
         if cmd not in self._loop_queues[loop_id]:
-            self._loop_queues[loop_id][cmd] = asyncio.Queue()
+            self._loop_queues[loop_id][cmd] = SubscriberQueue(maxsize, policy, conflate_key)
+        entry.add_subscriber(loop_id, self._loop_queues[loop_id][cmd], fields)
             
         # 向後兼容
         self.cmd_queues[cmd] = self._loop_queues[loop_id][cmd]
@@ -394,6 +1197,82 @@ class PacketHandler:
         
         return self._loop_queues[loop_id][cmd]
 
+    def stream(self, *cmds, vid=None, gmcode=None, filter=None, fields=None,
+               maxsize=DEFAULT_QUEUE_MAXSIZE, policy=DEFAULT_QUEUE_POLICY, conflate_key=None):
+        """
+        將多個指令合併成單一依序的封包串流
+
+        每個指令登記一個條件訂閱, 全部共用同一個佇列, 等待多個指令時不需要為每個指令建立 Task
+
+        參數:
+        - *cmds: 指令碼 (hex 字串或 int)
+        - vid (str | None): 只接收此桌台的封包
+        - gmcode (str | None): 只接收此局號的封包
+        - filter (callable | None): 自訂條件, 以解析後的協議內容呼叫
+        - fields (iterable | None): 只需要的欄位, 各指令只解包自己有的欄位; None 表示需要完整解析
+        - maxsize / policy / conflate_key: 佇列設定, 同 register_handler()
+
+        返回:
+        - PacketStream: 以 async for / await get(timeout) 讀取, 使用完畢後需呼叫 close() (或使用 async with)
+
+        範例:
+            async with packet_handler.stream(TABLE_STATUS_CMD, STOP_BET_CMD, vid="BC51") as events:
+                packet = await events.get(timeout=30)
+        """
+        if not cmds:
+            raise ValueError("stream() requires at least one cmd")
+        loop_id = id(asyncio.get_running_loop())
+        entries = [self._get_dispatch_entry(cmd) for cmd in cmds]
+
+        if fields is not None:
+            fields = frozenset(fields)
+            codecs = [entry.codec for entry in entries if entry.codec is not None]
+            if codecs and len(codecs) == len(entries):
+                # 提前檢查欄位名稱, 欄位至少需要存在於其中一個指令
+                unknown = fields.difference(*(codec.field_names for codec in codecs))
+                if unknown:
+                    raise ValueError(f"Unknown fields for stream {', '.join(entry.hex_cmd for entry in entries)}: {', '.join(sorted(unknown))}")
+
+        queue = SubscriberQueue(maxsize, policy, conflate_key)
+        subscriptions = []
+        for entry in entries:
+            entry_fields = fields
+            if fields is not None and entry.codec is not None:
+                entry_fields = fields.intersection(entry.codec.field_names)
+            subscription = Subscription(queue, loop_id, vid, gmcode, filter)
+            entry.add_filtered(subscription, entry_fields)
+            subscriptions.append((entry, subscription))
+        return PacketStream(queue, subscriptions)
+
+    def latest_channel(self, cmd, key="vid", fields=None):
+        """
+        取得指令的最新值通道, 同一個 (cmd, key) 共用同一個通道
+
+        參數:
+        - cmd: 指令碼 (hex 字串或 int)
+        - key (str): 區分狀態的欄位, 預設為 "vid" (每個桌台一個最新值)
+        - fields (iterable | None): 只需要的欄位, None 表示需要完整解析
+
+        返回:
+        - LatestValueChannel: 以 current(key) 取得目前狀態, await next(key) / wait_for(key, predicate) 等待狀態變化
+        """
+        entry = self._get_dispatch_entry(cmd)
+        if fields is not None and entry.codec is not None:
+            entry.codec.projection(fields)  # 提前檢查欄位名稱
+        return entry.get_channel(key, fields)
+
+    def unregister_handler(self, cmd, queue):
+        """移除以條件註冊的佇列 (register_handler 指定 vid / gmcode / predicate 時返回的佇列)
+
+        同一循環共用的佇列不會被移除, 其他地方可能仍在使用
+        """
+        entry = self._dispatch.get(normalize_cmd(cmd))
+        if entry is None:
+            return
+        for subscription in list(entry.iter_filtered()):
+            if subscription.queue is queue:
+                entry.remove_filtered(subscription)
+
     async def wait_for_response(self, cmd, timeout=30):
         """等待特定指令的回應
         
@@ -428,31 +1307,10 @@ class PacketHandler:
         - playtype (1 byte): 玩法類型, unit8
         - winlose (30 bytes): 輸贏金額, 30 bytes string
         """
-        results = []            # 存放解析結果
-        current_offset = offset # 起始解析位置
-        
-        # 透過迴圈解析每一組玩法+輸贏資料, count是玩法筆數
-        for _ in range(count):
-            if current_offset + 31 > len(data):  # 1 + 30 = 31 bytes per item, 一組玩法+輸贏資料長度固定為31 bytes
-                logger.warning(f"Data truncated, expected more items but reached end of data")
-                break
-                
-            # 解析玩法 playtype (1 byte)
-            # 未指定unpack長度, 則預設為1 byte
-            playtype = struct.unpack(">B", data[current_offset:current_offset+1])[0]    # slicing語法, 往後取得1 byte為playtype
-            current_offset += 1
-            
-            # 解析玩家輸贏 winlose (30 bytes)
-            # 長度是30 bytes, 所以這邊指定unpack長度為30 bytes >>> ">30s"
-            winlose = struct.unpack(">30s", data[current_offset:current_offset+30])[0]  # slicing語法, 再往後取得30 bytes為winlose
-            current_offset += 30
-            # 這邊unpack的資料型態是 bytes string, 需要轉換成 float
-            # decode("utf-8") 會將 bytes string 轉換成 utf-8 string
-            # strip() 會移除字串前後的空白字元, 這邊是移除\x00
-            # 最後再轉換成 float, 才是實際玩家輸贏
-            winlose_str = winlose.decode("utf-8").strip("\x00")
-            winlose_value = float(winlose_str)
-            
-            results.append({"playtype": playtype, "winlose": winlose_value})    # 將每一輪迴圈解包結果append到results list
+        # 一組玩法+輸贏資料長度固定為31 bytes (1 + 30), 透過 iter_unpack 一次解析所有資料
+        # winlose 是 bytes string, 去掉補齊用的\x00後再轉換成 float, 才是實際玩家輸贏
+        results, _ = decode_detail_items(data, offset, count)
+        if len(results) < count:
+            logger.warning(f"Data truncated, expected more items but reached end of data")
         
-        return results
\ No newline at end of file
+        return results
@@ -0,0 +1,139 @@
+import asyncio
+
+from utils.logger import logger
+
+
+class SendCoalescer:
+    """
+    將短時間內送出的多個封包合併成一個 WebSocket 訊息
+
+    接收端本來就會解析同一個訊息中的多個協議, 因此多桌投注、切換開關、心跳包等在同一個時間點送出的封包,
+    可以在 window 秒內 (或累積超過 max_bytes) 合併後再送出, 減少訊息數量與系統呼叫
+
+    Args:
+        send_func: 實際送出訊息的 coroutine function, 呼叫方式為 send_func(data, description), 例如 gate_handler.send
+        window (float): 合併等待時間(秒), 第一個封包進入佇列後最多等待此時間就送出
+        max_bytes (int): 累積的資料量達到此大小時立即送出
+
+    方法:
+    - send(packet, description, flush=False): 將封包放入佇列, flush=True 時連同佇列中的封包立即送出
+    - flush(): 立即送出佇列中的所有封包
+    - close(): 送出剩餘封包並停止計時
+    """
+
+    def __init__(self, send_func, window=0.005, max_bytes=16 * 1024):
+        self.send_func = send_func
+        self.window = window
+        self.max_bytes = max_bytes
+
+        self._buffer = bytearray()
+        self._descriptions = []
+        self._flush_handle = None       # 合併等待的計時器
+        self._flush_tasks = set()       # 計時器觸發的送出任務
+        self._lock = asyncio.Lock()     # 確保訊息依序送出
+
+        self.messages_sent = 0          # 實際送出的訊息數
+        self.packets_sent = 0           # 送出的封包數
+        self.bytes_sent = 0             # 送出的資料量 (bytes)
+
+    async def send(self, packet, description="", flush=False):
+        """
+        將封包放入佇列
+
+        Args:
+            packet (bytes): 完整的協議封包 (含header)
+            description (str): 封包描述, 用於送出時的log
+            flush (bool): 是否立即送出, 對延遲敏感的請求 (例如投注) 應設為 True
+        """
+        self._buffer += packet
+        self._descriptions.append(description)
+
+        if flush or len(self._buffer) >= self.max_bytes:
+            await self.flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.window, self._schedule_flush)
+
+    async def flush(self):
+        """立即送出佇列中的所有封包"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        async with self._lock:
+            if not self._buffer:
+                return
+            data = bytes(self._buffer)
+            descriptions = self._descriptions
+            self._buffer.clear()
+            self._descriptions = []
+
+            description = descriptions[0] if len(descriptions) == 1 else f"Coalesced {len(descriptions)} packets: {', '.join(descriptions)}"
+            await self.send_func(data, description)
+
+            self.messages_sent += 1
+            self.packets_sent += len(descriptions)
+            self.bytes_sent += len(data)
+
+    async def close(self):
+        """送出剩餘封包並停止計時"""
+        await self.flush()
+        for task in list(self._flush_tasks):
+            if not task.done():
+                await asyncio.gather(task, return_exceptions=True)
+
+    def stats(self):
+        """返回送出統計"""
+        return {
+            "messages_sent": self.messages_sent,
+            "packets_sent": self.packets_sent,
+            "bytes_sent": self.bytes_sent,
+            "pending_bytes": len(self._buffer),
+        }
+
+    def _schedule_flush(self):
+        """計時器到期, 建立送出任務"""
+        self._flush_handle = None
+        task = asyncio.ensure_future(self._timed_flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _timed_flush(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error sending coalesced packets: {e}")
+
+
+def enable_send_coalescing(gate_handler, window=0.005, max_bytes=16 * 1024):
+    """為 gate 連線啟用送出合併, 之後透過 send_packet() 送出的封包會先進入合併佇列
+
+    Returns:
+        SendCoalescer: 綁定在 gate_handler.send_coalescer 的合併佇列
+    """
+    gate_handler.send_coalescer = SendCoalescer(gate_handler.send, window, max_bytes)
+    return gate_handler.send_coalescer
+
+
+async def disable_send_coalescing(gate_handler):
+    """送出剩餘封包並停用送出合併"""
+    coalescer = getattr(gate_handler, "send_coalescer", None)
+    if coalescer is not None:
+        gate_handler.send_coalescer = None
+        await coalescer.close()
+
+
+async def send_packet(gate_handler, packet, description="", flush=False):
+    """送出封包, gate 連線有啟用送出合併時放入合併佇列, 否則直接送出
+
+    Args:
+        gate_handler: Gate Server 連線處理器
+        packet (bytes): 完整的協議封包 (含header)
+        description (str): 封包描述
+        flush (bool): 延遲敏感的請求設為 True, 連同佇列中的封包立即送出
+    """
+    coalescer = getattr(gate_handler, "send_coalescer", None)
+    if coalescer is None:
+        await gate_handler.send(packet, description)
+    else:
+        await coalescer.send(packet, description, flush=flush)
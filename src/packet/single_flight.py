@@ -0,0 +1,57 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    合併同時進行的相同請求
+
+    同一個連線上, fixture、餘額檢查、測試案例可能同時送出內容完全相同的請求 (例如設置相同的免傭開關),
+    以 (cmd, 請求欄位) 作為 key, 第一個呼叫者實際送出請求, 之後在回應前進入的呼叫者直接共用同一個結果
+
+    方法:
+    - run(key, func, *args, **kwargs): 執行 func, 相同 key 正在進行時等待同一個結果
+    """
+
+    def __init__(self):
+        self._calls = {}        # 進行中的請求 {(loop_id, key): Task}
+        self.calls = 0          # 實際執行的請求數
+        self.shared_calls = 0   # 共用進行中請求結果的次數
+
+    async def run(self, key, func, *args, **kwargs):
+        """
+        執行請求, 相同 key 的請求正在進行時不重複送出, 等待同一個結果
+
+        Args:
+            key (tuple): 請求的識別, 例如 (cmd, flag)
+            func: 實際送出請求並等待回應的 coroutine function
+            *args, **kwargs: 傳給 func 的參數
+
+        Returns:
+            func 的返回值
+        """
+        # Task 綁定在建立時的事件循環, 不同循環的呼叫者不能共用
+        call_key = (id(asyncio.get_running_loop()), key)
+        task = self._calls.get(call_key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[call_key] = task
+            task.add_done_callback(lambda done_task: self._forget(call_key, done_task))
+        else:
+            self.shared_calls += 1
+
+        # 單一呼叫者被取消時不影響其他共用同一個請求的呼叫者
+        return await asyncio.shield(task)
+
+    def _forget(self, call_key, task):
+        """請求完成後移除, 之後的呼叫會重新送出請求"""
+        if self._calls.get(call_key) is task:
+            del self._calls[call_key]
+
+    def stats(self):
+        """返回請求統計"""
+        return {
+            "calls": self.calls,
+            "shared_calls": self.shared_calls,
+            "in_flight": len(self._calls),
+        }
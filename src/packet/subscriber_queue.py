@@ -0,0 +1,169 @@
+import asyncio
+import sys
+
+# 佇列已滿時的處理方式
+QUEUE_POLICY_BLOCK = "block"                # 等待訂閱者取出 (封包處理器會暫停接收, 只適合一定會持續讀取的訂閱者)
+QUEUE_POLICY_DROP_OLDEST = "drop_oldest"    # 丟棄最舊的封包
+QUEUE_POLICY_DROP_NEWEST = "drop_newest"    # 丟棄新進的封包
+QUEUE_POLICY_CONFLATE = "conflate"          # 相同 key 的封包只保留最新的一筆, 佇列滿時丟棄最舊的封包
+QUEUE_POLICIES = (QUEUE_POLICY_BLOCK, QUEUE_POLICY_DROP_OLDEST, QUEUE_POLICY_DROP_NEWEST, QUEUE_POLICY_CONFLATE)
+
+# 訂閱佇列預設上限, 長時間沒有讀取的佇列 (例如測試之間的 table_status) 只保留最新的封包
+DEFAULT_QUEUE_MAXSIZE = 1024
+DEFAULT_QUEUE_POLICY = QUEUE_POLICY_DROP_OLDEST
+
+# Python 3.12 以上以 asyncio.timeout() 實作等待超時, 之前的版本以計時器設置等待中 Future 的例外
+_USE_ASYNCIO_TIMEOUT = sys.version_info >= (3, 12)
+
+
+class _ConflateSlot:
+    """conflate 佇列中的位置, 記錄封包的 key, 相同 key 的新封包直接取代 item"""
+
+    __slots__ = ("key", "item")
+
+    def __init__(self, key, item):
+        self.key = key
+        self.item = item
+
+
+class SubscriberQueue(asyncio.Queue):
+    """
+    有上限的訂閱佇列, 佇列已滿時依照 policy 處理新進的封包
+
+    conflate 時每個封包只在放入時呼叫一次 key 函數, 佇列中以 {key: _ConflateSlot} 找到相同 key 的位置直接取代
+
+    Args:
+        maxsize (int): 佇列上限, 0 表示不限制
+        policy (str): 佇列已滿時的處理方式, QUEUE_POLICIES 其中之一
+        key (callable | None): conflate 使用的 key 函數, 以封包呼叫, 例如 conflate_by_field("vid")
+
+    屬性:
+    - dropped (int): 因佇列已滿而丟棄的封包數
+    - conflated (int): 被相同 key 的新封包取代的封包數
+    """
+
+    def __init__(self, maxsize=DEFAULT_QUEUE_MAXSIZE, policy=DEFAULT_QUEUE_POLICY, key=None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}, expected one of {', '.join(QUEUE_POLICIES)}")
+        if policy == QUEUE_POLICY_CONFLATE and key is None:
+            raise ValueError("Conflate policy requires a key function")
+        super().__init__(maxsize)
+        self.policy = policy
+        self.key = key
+        self.dropped = 0
+        self.conflated = 0
+        self._slots = {} if policy == QUEUE_POLICY_CONFLATE else None     # 佇列中各 key 的位置 {key: _ConflateSlot}
+
+    async def put(self, item):
+        """
+        放入封包
+
+        Returns:
+            int: 因此次放入而丟棄或被取代的封包數 (0 或 1)
+        """
+        if self.policy == QUEUE_POLICY_BLOCK:
+            await super().put(item)
+            return 0
+
+        if self._slots is not None:
+            key = self.key(item)
+            slot = self._slots.get(key)
+            if slot is not None:
+                # 直接取代佇列中相同 key 的舊封包, 保持原本的位置
+                slot.item = item
+                self.conflated += 1
+                return 1
+            item = _ConflateSlot(key, item)
+
+        if not self.full():
+            self.put_nowait(item)
+            return 0
+
+        self.dropped += 1
+        if self.policy == QUEUE_POLICY_DROP_NEWEST:
+            return 1
+        self.get_nowait()
+        self.task_done()
+        self.put_nowait(item)
+        return 1
+
+    async def get(self, timeout=None):
+        """
+        取出封包, 佇列為空時等待
+
+        與 asyncio.wait_for(queue.get(), timeout) 不同, 等待超時不會為每次呼叫建立 Task:
+        Python 3.12 以上使用 asyncio.timeout(), 之前的版本在佇列的等待者中直接放入 Future,
+        以 loop.call_at 在超時時設置 asyncio.TimeoutError, 不會取消任何 Task
+
+        Args:
+            timeout (float | None): 等待超時時間(秒), 超時拋出 asyncio.TimeoutError, None 表示不限制
+        """
+        if timeout is None:
+            return await super().get()
+        if _USE_ASYNCIO_TIMEOUT:
+            async with asyncio.timeout(timeout):
+                return await super().get()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.empty():
+            waiter = loop.create_future()
+            self._getters.append(waiter)
+            handle = loop.call_at(deadline, _expire_waiter, waiter)
+            try:
+                await waiter
+            except BaseException:
+                # 與 asyncio.Queue.get 相同: 移除等待者, 已被喚醒但沒有取出時喚醒下一個等待者
+                waiter.cancel()
+                try:
+                    self._getters.remove(waiter)
+                except ValueError:
+                    pass
+                if not self.empty() and not waiter.cancelled():
+                    self._wakeup_next(self._getters)
+                raise
+            finally:
+                handle.cancel()
+        return self.get_nowait()
+
+    def _put(self, item):
+        if self._slots is not None:
+            if not isinstance(item, _ConflateSlot):
+                # 直接呼叫 put_nowait() 放入的封包
+                item = _ConflateSlot(self.key(item), item)
+            self._slots[item.key] = item
+        super()._put(item)
+
+    def _get(self):
+        item = super()._get()
+        if self._slots is not None:
+            if self._slots.get(item.key) is item:
+                del self._slots[item.key]
+            item = item.item
+        return item
+
+    def stats(self):
+        """返回佇列統計"""
+        return {
+            "size": self.qsize(),
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+        }
+
+
+def _expire_waiter(waiter):
+    """等待超時, 以例外結束等待中的 Future"""
+    if not waiter.done():
+        waiter.set_exception(asyncio.TimeoutError())
+
+
+def conflate_by_field(field):
+    """產生以協議欄位作為 conflate key 的函數, 例如 conflate_by_field("vid") 每個桌台只保留最新的封包"""
+
+    def key(packet):
+        data = packet.data
+        return data.get(field) if data is not None else None
+
+    return key
@@ -0,0 +1,53 @@
+from protocols.protocols import HEADER_SIZE
+from packet.codec import CODECS, HEADER_STRUCT
+
+
+class PacketTemplateCache:
+    """
+    靜態封包樣板快取
+
+    心跳包、餘額查詢、免傭 / 多寶開關等請求, 每次送出的內容都完全相同,
+    第一次使用時打包一次 (含header, seq 固定為0), 之後直接返回同一個 bytes 物件
+
+    方法:
+    - get(protocol_name, **kwargs): 取得協議封包, 相同參數返回同一個 bytes 物件
+    - warm(protocol_name, variants): 預先打包多組參數的封包
+    """
+
+    def __init__(self, codecs=None):
+        self._codecs = codecs or CODECS
+        self._packets = {}  # {(protocol_name, ((field, value), ...)): bytes}
+
+    def get(self, protocol_name, **kwargs):
+        """
+        取得協議封包 (含header)
+
+        參數:
+        - protocol_name (str): 協議名稱
+        - **kwargs: 封包數據, 必須是固定不變的值
+
+        返回:
+        - bytes: 打包後的封包
+        """
+        key = (protocol_name, tuple(sorted(kwargs.items())))
+        packet = self._packets.get(key)
+        if packet is None:
+            codec = self._codecs[protocol_name]
+            data = codec.encode(**kwargs)
+            packet = self._packets[key] = HEADER_STRUCT.pack(codec.cmd, HEADER_SIZE + len(data), 0) + data
+        return packet
+
+    def warm(self, protocol_name, variants=({},)):
+        """
+        預先打包多組參數的封包
+
+        參數:
+        - protocol_name (str): 協議名稱
+        - variants (iterable): 每組封包數據的 dict, 例如 [{"flag": 0}, {"flag": 1}]
+        """
+        for kwargs in variants:
+            self.get(protocol_name, **kwargs)
+
+
+# 全域共用的封包樣板快取, 樣板內容不隨連線改變, 所有連線共用
+packet_templates = PacketTemplateCache()
@@ -1,6 +1,20 @@
+import json
 import struct
+from protocols.records import make_record_class
+from protocols.string_cache import INTERN_MAX_SIZE, descriptor_string_cache
 from utils.logger import logger
 
+# 選用的高速 JSON 解析套件, 未安裝時使用標準庫 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
 
 class FieldDescriptor:
     """欄位描述器，描述如何解析一個協議欄位"""
@@ -11,7 +25,10 @@ class FieldDescriptor:
         self.field_type = field_type
     
     def parse(self, data, offset):
-        """解析欄位數據，返回解析後的值和下一個偏移位置"""
+        """解析欄位數據，返回解析後的值和下一個偏移位置
+
+        data 可以是 bytes 或 memoryview, 各欄位應透過 offset 直接讀取, 避免切割複製資料
+        """
         raise NotImplementedError("子類必須實現此方法")
         
 class FixedField(FieldDescriptor):
@@ -26,19 +43,45 @@ class FixedField(FieldDescriptor):
         if offset + self.size > len(data):
             raise ValueError(f"Data truncated for field {self.name}")
             
-        value = struct.unpack(f">{self.format_char}", data[offset:offset+self.size])[0]
+        value = struct.unpack_from(f">{self.format_char}", data, offset)[0]
         
         # 對字符串類型做特殊處理
         if self.format_char.endswith('s'):
             value = value.decode("utf-8").strip("\x00")
             
         return value, offset + self.size
+
+    def compile_expr(self, var):
+        """返回將 Struct 解出的原始值 var 轉換為欄位值的 Python 表達式, 供描述器編譯器產生解析函數
+
+        覆寫 parse() 的子類也必須覆寫此方法, 兩者的轉換結果需一致
+        """
+        if self.format_char.endswith('s'):
+            return f'{var}.decode("utf-8").strip("\\x00")'
+        return var
         
 class StringField(FixedField):
-    """字符串欄位描述器"""
+    """字符串欄位描述器
+
+    長度不超過 INTERN_MAX_SIZE 的欄位 (vid, gmtype, gmcode 等) 透過 descriptor_string_cache 解碼
+    """
     
     def __init__(self, name, size):
         super().__init__(name, size, "s", f"{size}s")
+        self.interned = size <= INTERN_MAX_SIZE
+
+    def parse(self, data, offset):
+        if not self.interned:
+            return super().parse(data, offset)
+        if offset + self.size > len(data):
+            raise ValueError(f"Data truncated for field {self.name}")
+        raw = struct.unpack_from(f">{self.format_char}", data, offset)[0]
+        return descriptor_string_cache.decode(raw), offset + self.size
+
+    def compile_expr(self, var):
+        if not self.interned:
+            return super().compile_expr(var)
+        return f"_string_cache.decode({var})"
         
 class IntField(FixedField):
     """整數欄位描述器"""
@@ -55,82 +98,235 @@ class FloatStringField(FixedField):
     
     def parse(self, data, offset):
         string_value, next_offset = super().parse(data, offset)
-        try:
-            return float(string_value), next_offset
-        except ValueError:
-            return 0.0, next_offset
+        return _float_or_zero(string_value), next_offset
+
+    def compile_expr(self, var):
+        return f"_float_or_zero({super().compile_expr(var)})"
+
+
+def _float_or_zero(string_value):
+    """將字串轉換為 float, 無法轉換時返回 0.0"""
+    try:
+        return float(string_value)
+    except ValueError:
+        return 0.0
             
+class JsonBackend:
+    """JSON 解析後端
+
+    屬性:
+    - name (str): 後端名稱
+    - loads (callable): 解析函數, 接受 bytes / memoryview
+    - errors (tuple): 解析失敗時會拋出的例外類型
+    - typed_decoder (callable | None): 依照 schema 建立直接解析為型別物件的解析函數, 僅 msgspec 支援
+    """
+
+    def __init__(self, name, loads, errors, typed_decoder=None):
+        self.name = name
+        self.loads = loads
+        self.errors = errors
+        self.typed_decoder = typed_decoder
+
+
+# 可用的 JSON 解析後端 {name: JsonBackend}, 標準庫 json.loads 不接受 memoryview, 需先轉換為 bytes
+JSON_BACKENDS = {"json": JsonBackend("json", lambda data: json.loads(bytes(data)), (ValueError,))}
+if msgspec is not None:
+    JSON_BACKENDS["msgspec"] = JsonBackend(
+        "msgspec",
+        msgspec.json.decode,
+        (msgspec.DecodeError,),
+        lambda schema: msgspec.json.Decoder(type=schema).decode,
+    )
+if orjson is not None:
+    JSON_BACKENDS["orjson"] = JsonBackend("orjson", orjson.loads, (orjson.JSONDecodeError,))
+
+# 目前使用的後端, 預設依序使用 orjson > msgspec > json
+_json_backend = JSON_BACKENDS.get("orjson") or JSON_BACKENDS.get("msgspec") or JSON_BACKENDS["json"]
+_typed_json = False
+
+
+def set_json_backend(name, typed=False):
+    """切換 JsonField 使用的 JSON 解析後端
+
+    Args:
+        name (str): 後端名稱, "json" / "orjson" / "msgspec" (需已安裝)
+        typed (bool): 是否直接解析為欄位指定的 schema 型別, 僅 msgspec 支援
+    """
+    global _json_backend, _typed_json
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"JSON backend '{name}' is not available, installed backends: {list(JSON_BACKENDS)}")
+    backend = JSON_BACKENDS[name]
+    if typed and backend.typed_decoder is None:
+        raise ValueError(f"JSON backend '{name}' does not support typed decoding")
+    _json_backend = backend
+    _typed_json = typed
+
+
+def get_json_backend():
+    """返回目前使用的 JSON 解析後端名稱"""
+    return _json_backend.name
+
+
+if msgspec is not None:
+    class GameResultJson(msgspec.Struct):
+        """game_result 協議中的開牌結果 JSON, 僅列出 recv_game_result 使用的欄位
+
+        預設值與 recv_game_result 取值時的預設值相同, 並提供 get() 與原本 dict 的取值方式相容
+        """
+
+        gmcode: str | None = None
+        res: int = 0
+        cards: list = []
+        dragontype: int = 999
+        dragonodd: int | float = 999
+        duobaotype: int = 999
+
+        def get(self, key, default=None):
+            return getattr(self, key, default)
+else:
+    GameResultJson = None
+
+
+class FieldErrorCounter:
+    """
+    欄位解析失敗但以預設值返回的次數 (例如 JsonField 解析失敗時返回原始字串或 {})
+
+    這類失敗不會拋出例外, 協議仍視為解析成功; LazyPacket 在解析前後比對 count, 記錄到該指令的 field_errors
+    """
+
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+field_errors = FieldErrorCounter()
+
+
 class JsonField(FieldDescriptor):
-    """JSON字符串欄位描述器"""
+    """JSON字符串欄位描述器
+
+    內容不是合法 JSON 時返回原始字串, 其他錯誤返回 {}, 兩者都會記錄在 field_errors
+
+    使用 set_json_backend() 指定的後端解析, schema 為選用的 msgspec.Struct 型別,
+    啟用 typed 解析時直接解析為該型別, 型別不符時退回一般解析
+    """
     
-    def __init__(self, name):
+    def __init__(self, name, schema=None):
         super().__init__(name)
+        self.schema = schema
+        self._typed_decoders = {}   # {backend name: decoder}
         
     def parse(self, data, offset):
         """解析JSON字符串，一直解析到數據結尾"""
-        import json
-        
         if offset >= len(data):
             return {}, offset
             
         try:
-            # 從offset到結尾的所有數據
-            json_bytes = data[offset:]
-            json_str = json_bytes.decode("utf-8").rstrip('\x00')
+            # 從offset到結尾的所有數據, 去掉結尾補齊用的\x00, memoryview 切割不會複製資料
+            json_bytes = memoryview(data)[offset:]
+            end = len(json_bytes)
+            while end and json_bytes[end - 1] == 0:
+                end -= 1
+            json_bytes = json_bytes[:end]
             
             # 嘗試解析為JSON對象
+            backend = _json_backend
+            if _typed_json and self.schema is not None:
+                try:
+                    return self._typed_decoder(backend)(json_bytes), len(data)
+                except backend.errors:
+                    pass    # 型別不符, 退回一般解析
             try:
-                json_obj = json.loads(json_str)
-                return json_obj, len(data)
-            except json.JSONDecodeError:
-                return json_str, len(data)
+                return backend.loads(json_bytes), len(data)
+            except backend.errors:
+                field_errors.count += 1
+                return str(json_bytes, "utf-8"), len(data)
         except Exception as e:
+            field_errors.count += 1
             logger.error(f"Error parsing JSON field: {e}")
             return {}, len(data)
+
+    def _typed_decoder(self, backend):
+        """取得 (並快取) 依照 schema 解析的解析函數"""
+        decoder = self._typed_decoders.get(backend.name)
+        if decoder is None:
+            decoder = self._typed_decoders[backend.name] = backend.typed_decoder(self.schema)
+        return decoder
             
+# 下注詳情的單筆格式: 玩法 playtype (uint8) + 輸贏金額 winlose (30 bytes 字串), 固定 31 bytes
+DETAIL_ITEM_STRUCT = struct.Struct(">B30s")
+
+
+def decode_detail_items(data, offset, count, as_mapping=False):
+    """批次解析下注詳情, 以 struct.iter_unpack 一次走完整段詳情資料
+
+    Args:
+        data (bytes | memoryview): 協議本體數據
+        offset (int): 下注詳情的起始位置
+        count (int): 玩法筆數
+        as_mapping (bool): True 時返回 {playtype: winlose}, False 時返回 [{"playtype", "winlose"}, ...]
+
+    Returns:
+        tuple: (解析結果, 下一個偏移位置), 資料不足 count 筆時只解析完整的部分
+    """
+    item_size = DETAIL_ITEM_STRUCT.size
+    available = min(count, max(len(data) - offset, 0) // item_size)
+    end = offset + available * item_size
+    # memoryview 切割不會複製資料
+    records = DETAIL_ITEM_STRUCT.iter_unpack(memoryview(data)[offset:end])
+
+    # float() 可直接轉換 bytes, 只需去掉補齊用的 \x00
+    if as_mapping:
+        return {playtype: float(winlose.strip(b"\x00")) for playtype, winlose in records}, end
+    return [
+        {"playtype": playtype, "winlose": float(winlose.strip(b"\x00"))} for playtype, winlose in records
+    ], end
+
+
 class BettingDetailField(FieldDescriptor):
-    """下注詳情欄位描述器 (用於 settle_resp)"""
+    """下注詳情欄位描述器 (用於 settle_resp)
+
+    as_mapping=True 時直接解析為 {playtype: winlose}, 否則為 [{"playtype", "winlose"}, ...]
+    """
     
-    def __init__(self, name, count_field):
+    def __init__(self, name, count_field, as_mapping=False):
         super().__init__(name)
         self.count_field = count_field  # 引用計數欄位的名稱
+        self.as_mapping = as_mapping
         
     def parse(self, data, offset, field_values):
-        """解析下注詳情列表"""
+        """解析下注詳情"""
         count = field_values.get(self.count_field, 0)
-        results = []
-        current_offset = offset
-        
-        for _ in range(count):
-            if current_offset + 31 > len(data):
-                break
-                
-            # 解析玩法類型 (1 byte)
-            playtype = struct.unpack(">B", data[current_offset:current_offset+1])[0]
-            current_offset += 1
-            
-            # 解析輸贏金額 (30 bytes)
-            winlose_bytes = struct.unpack(">30s", data[current_offset:current_offset+30])[0]
-            current_offset += 30
-            winlose_str = winlose_bytes.decode("utf-8").strip("\x00")
-            winlose_value = float(winlose_str)
-            
-            results.append({"playtype": playtype, "winlose": winlose_value})
-            
-        return results, current_offset
+        return decode_detail_items(data, offset, count, self.as_mapping)
 
 # 協議描述器
 class ProtocolDescriptor:
-    """協議描述器，描述整個協議的結構"""
+    """協議描述器，描述整個協議的結構
+
+    建立時會透過 compile_descriptor() 將欄位列表編譯成專用的解析函數,
+    parse() 使用編譯後的函數並返回 record_class 實例 (以 __slots__ 儲存欄位, 相容 dict 取值),
+    parse_fields() 保留逐欄位解析並返回 dict 的方式 (作為對照與除錯使用)
+    """
     
     def __init__(self, name, fields):
         self.name = name
         self.fields = fields
+        self.record_class = make_record_class(name, [field.name for field in fields])
+        self._compiled_parse = compile_descriptor(self)
         
-    def parse(self, data):
-        """解析協議數據"""
+    def parse(self, data, offset=0):
+        """解析協議數據
+
+        Args:
+            data (bytes | memoryview): 協議本體數據
+            offset (int): 協議本體在 data 中的起始位置
+        """
+        return self._compiled_parse(data, offset)
+
+    def parse_fields(self, data, offset=0):
+        """逐欄位解析協議數據, 結果與 parse() 相同"""
         result = {}
-        offset = 0
         
         for field in self.fields:
             if isinstance(field, BettingDetailField):
@@ -143,6 +339,71 @@ class ProtocolDescriptor:
             
         return result
 
+
+def compile_descriptor(descriptor):
+    """將協議描述器編譯成專用的解析函數
+
+    - 連續的固定大小欄位合併成一個預先編譯好的 struct.Struct, 一次 unpack_from 取出所有值
+    - 依照欄位列表產生專用的 Python 原始碼, 省去逐欄位的 isinstance 判斷與 format 字串組合
+    - 不定長度的欄位 (JsonField, BettingDetailField 等) 仍呼叫欄位本身的 parse()
+    - 欄位值存放在區域變數, 最後直接建立 descriptor.record_class (無法產生時建立 dict)
+
+    Args:
+        descriptor (ProtocolDescriptor): 協議描述器
+
+    Returns:
+        callable: parse(data, offset=0), 產生的原始碼保存在 parse.source
+    """
+    namespace = {
+        "_float_or_zero": _float_or_zero,
+        "_string_cache": descriptor_string_cache,
+        "_record": descriptor.record_class,
+    }
+    lines = [f"def parse_{descriptor.name}(data, offset=0):"]
+    local_names = {field.name: f"_l{index}" for index, field in enumerate(descriptor.fields)}
+
+    # 將欄位切分成 [固定大小欄位群組] 與 [需要個別處理的欄位]
+    groups = []
+    for field in descriptor.fields:
+        if isinstance(field, FixedField):
+            if groups and isinstance(groups[-1], list):
+                groups[-1].append(field)
+            else:
+                groups.append([field])
+        else:
+            groups.append(field)
+
+    for index, group in enumerate(groups):
+        if isinstance(group, list):
+            # 合併後的固定大小欄位群組, 例如 settle_resp 的 4s14sI30sB 共 53 bytes
+            fused = struct.Struct(">" + "".join(field.format_char for field in group))
+            namespace[f"_s{index}"] = fused
+            lines.append(f"    if len(data) - offset < {fused.size}:")
+            lines.append(f"        raise ValueError('Data truncated for field {group[0].name}')")
+            lines.append(f"    _v = _s{index}.unpack_from(data, offset)")
+            for position, field in enumerate(group):
+                lines.append(f"    {local_names[field.name]} = {field.compile_expr(f'_v[{position}]')}")
+            lines.append(f"    offset += {fused.size}")
+        else:
+            namespace[f"_f{index}"] = group
+            target = local_names[group.name]
+            if isinstance(group, BettingDetailField):
+                # 特殊處理需要引用其他欄位值的欄位, 只傳入所需的計數欄位
+                count = local_names[group.count_field]
+                lines.append(f"    {target}, offset = _f{index}.parse(data, offset, {{{group.count_field!r}: {count}}})")
+            else:
+                lines.append(f"    {target}, offset = _f{index}.parse(data, offset)")
+
+    if descriptor.record_class is not None:
+        lines.append(f"    return _record({', '.join(local_names.values())})")
+    else:
+        lines.append("    return {" + ", ".join(f"{name!r}: {local}" for name, local in local_names.items()) + "}")
+    source = "\n".join(lines)
+    exec(compile(source, f"<descriptor {descriptor.name}>", "exec"), namespace)
+    parse = namespace[f"parse_{descriptor.name}"]
+    parse.source = source
+    return parse
+
 # 預定義協議描述器
 PROTOCOL_DESCRIPTORS = {
     "settle_resp": ProtocolDescriptor("settle_resp", [
@@ -151,13 +412,13 @@ PROTOCOL_DESCRIPTORS = {
         IntField("seat", 4),
         FloatStringField("res", 30),
         IntField("count", 1),
-        BettingDetailField("detail_items", "count")
+        BettingDetailField("detail_items", "count", as_mapping=True)    # {playtype: winlose}
     ]),
     
     "game_result": ProtocolDescriptor("game_result", [
         StringField("vid", 4),
         StringField("gmtype", 4),
-        JsonField("json")
+        JsonField("json", schema=GameResultJson)
     ]),
     
     # 可以添加更多協議...
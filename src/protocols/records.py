@@ -0,0 +1,96 @@
+import keyword
+
+
+class ProtocolRecord:
+    """
+    解析後的協議內容, 由 make_record_class() 依照協議欄位產生使用 __slots__ 的子類
+
+    每個欄位都是實例屬性 (例如 record.vid), 同時提供 get() / [] / in / keys() 等 dict 操作,
+    原本 response.get("data", {}).get("vid") 的寫法不需要修改
+    """
+
+    __slots__ = ()
+    _fields = ()
+
+    def get(self, key, default=None):
+        if key in self._fields:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(getattr(self, field) for field in self._fields)
+
+    def items(self):
+        return tuple((field, getattr(self, field)) for field in self._fields)
+
+    def to_dict(self):
+        """轉換為 dict"""
+        return {field: getattr(self, field) for field in self._fields}
+
+    def __eq__(self, other):
+        if isinstance(other, ProtocolRecord):
+            return type(self) is type(other) and self.values() == other.values()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self._fields)
+        return f"{type(self).__name__}({fields})"
+
+
+def record_class_name(protocol_name):
+    """協議名稱轉換為類別名稱, 例如 table_status -> TableStatus"""
+    return "".join(part.capitalize() for part in protocol_name.split("_"))
+
+
+def make_record_class(protocol_name, field_names):
+    """
+    依照協議欄位產生 ProtocolRecord 子類, 欄位依序作為 __init__ 的參數
+
+    欄位名稱不是合法的識別字, 或與 ProtocolRecord 的方法同名時無法產生, 返回 None (該協議維持使用 dict)
+
+    參數:
+    - protocol_name (str): 協議名稱
+    - field_names (iterable): 欄位名稱, 依照協議中的順序
+
+    返回:
+    - type | None: 產生的類別
+    """
+    field_names = tuple(field_names)
+    if len(set(field_names)) != len(field_names):
+        return None
+    for field in field_names:
+        if not field.isidentifier() or keyword.iskeyword(field) or hasattr(ProtocolRecord, field):
+            return None
+
+    # 產生專用的 __init__, 避免逐欄位 setattr
+    arguments = "".join(f", {field}" for field in field_names)
+    body = "".join(f"\n    self.{field} = {field}" for field in field_names) or "\n    pass"
+    namespace = {}
+    exec(f"def __init__(self{arguments}):{body}", namespace)
+
+    return type(
+        record_class_name(protocol_name),
+        (ProtocolRecord,),
+        {"__slots__": field_names, "_fields": field_names, "__init__": namespace["__init__"]},
+    )
@@ -0,0 +1,70 @@
+import sys
+
+# 長度不超過此值的固定長度字串欄位才使用快取 (vid, gmtype, gmcode 等會重複出現的代碼),
+# 較長的欄位 (例如 30 bytes 的金額字串) 幾乎不會重複, 放入快取只會降低命中率
+INTERN_MAX_SIZE = 16
+
+
+class StringInternCache:
+    """
+    固定長度字串欄位的解碼快取 {原始 bytes: 解碼後的 str}
+
+    vid / gmtype 只有少數幾種值, 同一局的 gmcode 也會在 table_status、bet_resp、game_result、
+    settle_resp 重複出現, 相同的原始 bytes 直接返回快取的字串, 不需要每次 decode + strip.
+    快取的字串經過 sys.intern(), 與程式中的字串常數比較 (如 vid == table_id) 時可直接比對 identity
+
+    Args:
+        strip_chars (str | None): 解碼後要去除的字元, None 表示去除前後空白字元
+        maxsize (int): 快取上限, 超過時移除最早加入的項目
+    """
+
+    def __init__(self, strip_chars=None, maxsize=4096):
+        self.strip_chars = strip_chars
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = {}
+
+    def decode(self, raw):
+        """解碼原始 bytes, 命中快取時直接返回快取的字串"""
+        value = self._cache.get(raw)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = sys.intern(raw.decode("utf-8").strip(self.strip_chars))
+        if len(self._cache) >= self.maxsize:
+            # dict 保留插入順序, 移除最早加入的項目
+            del self._cache[next(iter(self._cache))]
+        self._cache[raw] = value
+        return value
+
+    def stats(self):
+        """返回快取統計 {size, hits, misses, hit_rate}"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        """清除快取與統計"""
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# 描述器欄位 (StringField) 去除補齊用的 \x00, 一般協議解包 (ProtocolCodec) 去除前後空白字元, 兩者結果不同需分開快取
+descriptor_string_cache = StringInternCache(strip_chars="\x00")
+codec_string_cache = StringInternCache()
+
+
+def string_cache_stats():
+    """返回所有字串快取的統計"""
+    return {
+        "descriptor": descriptor_string_cache.stats(),
+        "codec": codec_string_cache.stats(),
+    }
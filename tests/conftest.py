@@ -15,6 +15,9 @@ from src.utils.config_manager import ConfigManager
 
 from src.gateserver.gateserver_handler import GateServerHandler
 from src.heartbeat.heartbeat import start_heartbeat
+from src.game.table_state import enable_table_state_cache
+from src.packet.frame_stats import append_stats_report
+from src.packet.send_coalescer import disable_send_coalescing, enable_send_coalescing
 from src.utils.logger import logger
 
 
@@ -55,6 +58,14 @@ def pytest_addoption(parser):
         "--seamless", action="store", default=None, choices=["True", "False"],
         help="是否為單一錢包帳號，不指定則使用所有玩家，指定 True 為單一錢包，False 為轉帳錢包"
     )
+    parser.addoption(
+        "--table-state-cache", action="store_true", default=False,
+        help="啟用桌台狀態快取，追蹤下注的桌台，桌台已經在投注階段且剩餘時間足夠時直接投注"
+    )
+    parser.addoption(
+        "--send-coalescing", action="store_true", default=False,
+        help="啟用送出合併，短時間內送出的非投注封包合併成一個 WebSocket 訊息"
+    )
 
 def pytest_generate_tests(metafunc):
     """
@@ -197,7 +208,7 @@ def player_connection_factory(scope):
     """產生不同 scope 的玩家連線 fixture Factory Function"""
     
     @pytest.fixture(scope=scope)
-    async def _player_connection(player_data):
+    async def _player_connection(player_data, request):
         """提供玩家連線的 fixture
         
         scope 參數決定了此 fixture 的生命週期：
@@ -224,6 +235,12 @@ def player_connection_factory(scope):
                 # 登入成功, 啟動心跳包
                 loop = asyncio.get_running_loop()
                 hb_task = loop.create_task(start_heartbeat(handler))
+                # 指定 --table-state-cache 時持續追蹤下注的桌台狀態, 桌台已經在投注階段時 place_bet 可以直接投注
+                if request.config.getoption("--table-state-cache"):
+                    enable_table_state_cache(handler)
+                # 指定 --send-coalescing 時, 同一時間點送出的非投注封包合併成一個 WebSocket 訊息
+                if request.config.getoption("--send-coalescing"):
+                    enable_send_coalescing(handler)
                 await asyncio.sleep(0.1)
                 yield handler, player_init_balance
             else:
@@ -245,7 +262,25 @@ def player_connection_factory(scope):
                 except Exception as e:
                     logger.error(f">>> [FIXTURE] Unexpected error during cancellation: {e}")
 
+            # 送出合併佇列中剩餘的封包
+            try:
+                await disable_send_coalescing(handler)
+            except Exception as e:
+                logger.error(f">>> [FIXTURE] Error flushing coalesced packets: {e}")
+
             if hasattr(handler, 'packet_handler'):
+                # 將此連線的接收統計附加到本次測試的報告目錄
+                try:
+                    stats_path = Path(project_root) / "reports" / f"frame_stats_{request.config._timestamp}.jsonl"
+                    append_stats_report(stats_path, {
+                        "node": request.node.nodeid,
+                        "player_id": player_data.get("player_id"),
+                        "scope": scope,
+                        **handler.packet_handler.get_frame_stats(),
+                    })
+                except Exception as e:
+                    logger.error(f">>> [FIXTURE] Error dumping frame stats: {e}")
+
                 try:
                     await handler.packet_handler.stop_processor()
                 except Exception as e:
@@ -0,0 +1,68 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from src.packet.codec import CODECS, HEADER_STRUCT
+from src.packet.packet_handler import PacketHandler
+from src.protocols.protocols import PROTOCOLS
+
+
+class FakeWsClient:
+    """
+    以佇列模擬 WebSocket client, 離線測試封包處理器
+
+    feed() 放入的資料依序由 recv_raw() 返回, 每一段資料視為一個 WebSocket 訊息;
+    drain() 等待所有放入的訊息都被處理器處理完
+    """
+
+    def __init__(self):
+        self.websocket = True
+        self._messages = asyncio.Queue()
+        self._in_flight = False
+
+    def feed(self, *messages):
+        for message in messages:
+            self._messages.put_nowait(message)
+
+    async def recv_raw(self):
+        # 處理器再次接收時, 表示上一段訊息已經處理完
+        if self._in_flight:
+            self._in_flight = False
+            self._messages.task_done()
+        message = await self._messages.get()
+        self._in_flight = True
+        return message
+
+    async def drain(self, timeout=1):
+        await asyncio.wait_for(self._messages.join(), timeout)
+
+
+def make_frame(protocol_name, seq=0, tail=b"", **fields):
+    """依照協議定義產生完整的協議封包 (含header), tail 接在協議本體之後 (不定長度的資料)"""
+    body = CODECS[protocol_name].encode(**fields) + tail
+    return HEADER_STRUCT.pack(PROTOCOLS[protocol_name]["cmd"], HEADER_STRUCT.size + len(body), seq) + body
+
+
+@asynccontextmanager
+async def running_packet_handler():
+    """啟動以 FakeWsClient 接收資料的封包處理器, 離開時停止"""
+    ws_client = FakeWsClient()
+    handler = PacketHandler(ws_client)
+    await handler.start_processor()
+    try:
+        yield handler, ws_client
+    finally:
+        await handler.stop_processor()
+
+
+@pytest.fixture
+def build_frame():
+    """產生協議封包的函數, build_frame(protocol_name, seq=0, tail=b"", **fields)"""
+    return make_frame
+
+
+@pytest.fixture
+def running_handler():
+    """啟動離線封包處理器的 async context manager, 返回 (PacketHandler, FakeWsClient)"""
+    return running_packet_handler
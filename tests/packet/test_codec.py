@@ -0,0 +1,99 @@
+import pytest
+
+from src.packet.codec import ProtocolCodec
+
+pytestmark = pytest.mark.unit
+
+# 測試用協議, format 只需要提供 byte order, 不定長度協議的 Struct 由欄位定義編譯
+TAIL_PROTOCOL = {
+    "cmd": 0x7F0001,
+    "fields": [("vid", 4, "s"), ("count", 1, "B"), ("json", 0, "s")],
+    "format": ">4sB",
+}
+TAIL_WITH_TRAILER_PROTOCOL = {
+    "cmd": 0x7F0002,
+    "fields": [("vid", 4, "s"), ("json", 0, "s"), ("crc", 4, "I")],
+    "format": ">4sI",
+}
+PREFIXED_PROTOCOL = {
+    "cmd": 0x7F0003,
+    "fields": [("vid", 4, "s"), ("state_data", 2, "V"), ("status", 1, "B"), ("note", 1, "V")],
+    "format": ">4sHBB",
+}
+
+
+def test_tail_field_round_trip():
+    codec = ProtocolCodec("tail", TAIL_PROTOCOL)
+    assert codec.variable
+    assert codec.size == 5
+
+    data = codec.encode(vid="BC51", count=3, json='{"cards": []}')
+    assert data == b"BC51\x03" + b'{"cards": []}'
+    record = codec.decode(data)
+    assert record.vid == "BC51"
+    assert record.count == 3
+    assert record.json == '{"cards": []}'
+
+
+def test_empty_tail_field():
+    codec = ProtocolCodec("tail", TAIL_PROTOCOL)
+    record = codec.decode(codec.encode(vid="BC51", count=0))
+    assert record.json == ""
+
+
+def test_tail_field_followed_by_fixed_field():
+    codec = ProtocolCodec("tail_trailer", TAIL_WITH_TRAILER_PROTOCOL)
+    data = codec.encode(vid="BC51", json="abc", crc=0xDEADBEEF)
+    record = codec.decode(data)
+    assert record.json == "abc"
+    assert record.crc == 0xDEADBEEF
+
+
+def test_tail_field_keeps_binary_content():
+    codec = ProtocolCodec("tail", TAIL_PROTOCOL)
+    record = codec.decode(codec.encode(vid="BC51", count=1, json=b"\xff\x00\x01"))
+    assert record.json == b"\xff\x00\x01"
+
+
+def test_length_prefixed_round_trip():
+    codec = ProtocolCodec("prefixed", PREFIXED_PROTOCOL)
+    assert codec.size == 4 + 2 + 1 + 1
+
+    data = codec.encode(vid="BC51", state_data="x" * 300, status=2, note="ok")
+    assert data[4:6] == (300).to_bytes(2, "big")
+    record = codec.decode(b"\x00\x00" + data, offset=2)
+    assert record.vid == "BC51"
+    assert record.state_data == "x" * 300
+    assert record.status == 2
+    assert record.note == "ok"
+
+
+def test_length_prefixed_value_too_long():
+    codec = ProtocolCodec("prefixed", PREFIXED_PROTOCOL)
+    with pytest.raises(ValueError):
+        codec.encode(vid="BC51", note="x" * 256)
+
+
+def test_length_prefix_exceeding_data_is_rejected():
+    codec = ProtocolCodec("prefixed", PREFIXED_PROTOCOL)
+    data = codec.encode(vid="BC51", state_data="abcd", status=1, note="")
+    with pytest.raises(ValueError):
+        codec.decode(data[:-3])
+
+
+def test_invalid_variable_layouts():
+    with pytest.raises(ValueError):
+        ProtocolCodec("bad_prefix", {"cmd": 1, "fields": [("data", 3, "V")], "format": ">"})
+    with pytest.raises(ValueError):
+        ProtocolCodec("two_tails", {"cmd": 1, "fields": [("a", 0, "s"), ("b", 0, "s")], "format": ">"})
+
+
+def test_variable_codec_projects_leading_fixed_fields():
+    codec = ProtocolCodec("tail", TAIL_PROTOCOL)
+    projection = codec.projection(("vid",))
+    assert projection is not None
+    assert projection.struct.size == 5
+    assert projection.decode(codec.encode(vid="BC51", count=3, json="{}")).vid == "BC51"
+    # 不定長度欄位本身與其後的欄位無法投影
+    assert codec.projection(("vid", "json")) is None
+    assert ProtocolCodec("prefixed", PREFIXED_PROTOCOL).projection(("status",)) is None
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from src.packet.codec import HEADER_STRUCT
+from src.packet.packet_handler import MAX_UNKNOWN_FRAME_SIZE
+from src.protocols.protocols import PROTOCOLS
+
+pytestmark = pytest.mark.unit
+
+TABLE_STATUS_CMD = PROTOCOLS["table_status"]["cmd"]
+UNKNOWN_CMD = 0x7F0000  # 未定義於 PROTOCOLS 的指令
+
+
+async def _received(queue, count):
+    return [await asyncio.wait_for(queue.get(), 1) for _ in range(count)]
+
+
+async def test_frame_split_across_messages_is_reassembled(running_handler, build_frame):
+    frame = build_frame("table_status", vid="BC51", gmcode="G2507290000001", status=1)
+    async with running_handler() as (handler, ws_client):
+        queue = await handler.register_handler(TABLE_STATUS_CMD)
+        # 第一段只有半個header, 第二段停在協議本體中間
+        ws_client.feed(frame[:5], frame[5:HEADER_STRUCT.size + 3], frame[HEADER_STRUCT.size + 3:])
+        await ws_client.drain()
+
+        (packet,) = await _received(queue, 1)
+        assert packet.data["vid"] == "BC51"
+        assert packet.data["status"] == 1
+        assert handler.carry_events == 2
+        assert not handler._recv_buffer
+
+
+async def test_multiple_frames_in_one_message(running_handler, build_frame):
+    frames = [build_frame("table_status", vid="BC51", status=status) for status in (0, 1, 2)]
+    async with running_handler() as (handler, ws_client):
+        queue = await handler.register_handler(TABLE_STATUS_CMD)
+        # 最後一個協議被拆到下一個訊息
+        data = b"".join(frames)
+        ws_client.feed(data[:-4], data[-4:])
+        await ws_client.drain()
+
+        packets = await _received(queue, 3)
+        assert [packet.data["status"] for packet in packets] == [0, 1, 2]
+        assert handler.resync_events == 0
+
+
+async def test_resync_after_garbage(running_handler, build_frame):
+    frame = build_frame("table_status", vid="BC51", status=1)
+    async with running_handler() as (handler, ws_client):
+        queue = await handler.register_handler(TABLE_STATUS_CMD)
+        ws_client.feed(b"\xff" * 7 + frame)
+        await ws_client.drain()
+
+        (packet,) = await _received(queue, 1)
+        assert packet.data["status"] == 1
+        assert handler.resync_events == 1
+        assert handler.resync_skipped_bytes == 7
+
+
+async def test_oversized_unknown_header_does_not_swallow_following_frames(running_handler, build_frame):
+    frame = build_frame("table_status", vid="BC51", status=1)
+    bogus_header = HEADER_STRUCT.pack(UNKNOWN_CMD, MAX_UNKNOWN_FRAME_SIZE + 1, 0)
+    async with running_handler() as (handler, ws_client):
+        queue = await handler.register_handler(TABLE_STATUS_CMD)
+        ws_client.feed(bogus_header + frame)
+        await ws_client.drain()
+
+        (packet,) = await _received(queue, 1)
+        assert packet.data["status"] == 1
+        connection = handler.get_frame_stats()["connection"]
+        assert connection["rejected_unknown_headers"] == 1
+        assert connection["resync_skipped_bytes"] == HEADER_STRUCT.size
+
+
+async def test_small_unknown_frame_is_skipped_without_resync(running_handler, build_frame):
+    unknown_frame = HEADER_STRUCT.pack(UNKNOWN_CMD, HEADER_STRUCT.size + 8, 0) + bytes(8)
+    frame = build_frame("table_status", vid="BC51", status=1)
+    async with running_handler() as (handler, ws_client):
+        queue = await handler.register_handler(TABLE_STATUS_CMD)
+        ws_client.feed(unknown_frame + frame)
+        await ws_client.drain()
+
+        (packet,) = await _received(queue, 1)
+        assert packet.data["status"] == 1
+        connection = handler.get_frame_stats()["connection"]
+        assert connection["unknown_headers"] == 1
+        assert connection["rejected_unknown_headers"] == 0
+        assert connection["resync_events"] == 0
@@ -0,0 +1,40 @@
+import pytest
+
+from src.packet.codec import HEADER_STRUCT
+from src.packet.frame_stats import UNKNOWN_COMMAND
+from src.protocols.protocols import PROTOCOLS
+
+pytestmark = pytest.mark.unit
+
+GAME_RESULT_CMD = PROTOCOLS["game_result"]["cmd"]
+
+
+async def test_unknown_commands_share_one_bucket(running_handler):
+    frames = b"".join(HEADER_STRUCT.pack(0x7F0000 + index, HEADER_STRUCT.size + 4, 0) + bytes(4) for index in range(20))
+    async with running_handler() as (handler, ws_client):
+        ws_client.feed(frames)
+        await ws_client.drain()
+
+        commands = handler.get_frame_stats()["commands"]
+        assert [stats["cmd"] for stats in commands] == [UNKNOWN_COMMAND]
+        assert commands[0]["frames"] == 20
+        assert commands[0]["dropped_no_subscriber"] == 20
+        assert handler.get_frame_stats()["connection"]["unknown_headers"] == 20
+
+
+async def test_swallowed_json_errors_are_counted(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        queue = await handler.register_handler(GAME_RESULT_CMD)
+        ws_client.feed(
+            build_frame("game_result", vid="BC51", gmtype="BAC", json='{"banker": []}'),
+            build_frame("game_result", vid="BC51", gmtype="BAC", json='{"banker": ['),
+        )
+        await ws_client.drain()
+
+        valid, invalid = queue.get_nowait(), queue.get_nowait()
+        assert valid.data["json"] == {"banker": []}
+        assert invalid.data["json"] == '{"banker": ['
+        stats = handler.frame_stats.command(GAME_RESULT_CMD)
+        assert stats.decodes == 2
+        assert stats.parse_failures == 0
+        assert stats.field_errors == 1
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from src.protocols.protocols import PROTOCOLS
+
+pytestmark = pytest.mark.unit
+
+TABLE_STATUS_CMD = PROTOCOLS["table_status"]["cmd"]
+STOP_BET_CMD = PROTOCOLS["stop_bet"]["cmd"]
+
+
+async def test_stream_merges_commands_in_arrival_order(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        async with handler.stream(TABLE_STATUS_CMD, STOP_BET_CMD, vid="BC51") as events:
+            ws_client.feed(
+                build_frame("table_status", vid="BC51", status=1),
+                build_frame("table_status", vid="BC52", status=1),
+                build_frame("stop_bet", vid="BC51"),
+            )
+            await ws_client.drain()
+
+            first = await events.get(timeout=1)
+            second = await events.get(timeout=1)
+            assert (first["cmd"], second["cmd"]) == (hex(TABLE_STATUS_CMD), hex(STOP_BET_CMD))
+            assert events.queue.empty()
+
+        assert events.closed
+        assert not handler._dispatch[TABLE_STATUS_CMD].has_subscribers
+
+
+async def test_stream_get_timeout(running_handler):
+    async with running_handler() as (handler, _):
+        async with handler.stream(TABLE_STATUS_CMD, vid="BC51") as events:
+            with pytest.raises(asyncio.TimeoutError):
+                await events.get(timeout=0.01)
+
+
+async def test_outside_cancel_is_not_turned_into_timeout(running_handler):
+    async with running_handler() as (handler, _):
+        async with handler.stream(TABLE_STATUS_CMD, vid="BC51") as events:
+            task = asyncio.ensure_future(events.get(timeout=1))
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+
+async def test_timed_get_does_not_create_a_task_per_call(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        async with handler.stream(TABLE_STATUS_CMD, vid="BC51") as events:
+            tasks_before = len(asyncio.all_tasks())
+            for status in (1, 2, 3):
+                waiter = asyncio.ensure_future(events.get(timeout=1))
+                await asyncio.sleep(0)
+                # 只有等待者本身的 Task, 沒有為超時建立額外的 Task
+                assert len(asyncio.all_tasks()) == tasks_before + 1
+
+                ws_client.feed(build_frame("table_status", vid="BC51", status=status))
+                packet = await asyncio.wait_for(waiter, 1)
+                assert packet.data["status"] == status
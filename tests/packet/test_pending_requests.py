@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from src.protocols.protocols import PROTOCOLS
+
+pytestmark = pytest.mark.unit
+
+BET_RESP_CMD = PROTOCOLS["bet_resp"]["cmd"]
+
+
+async def test_response_resolves_request_with_same_seq(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        first = handler.expect_response(BET_RESP_CMD, 1000, match={"vid": "BC51"})
+        second = handler.expect_response(BET_RESP_CMD, 2000, match={"vid": "BC51"})
+        ws_client.feed(build_frame("bet_resp", seq=2000, code=0, vid="BC51"))
+        await ws_client.drain()
+
+        assert not first.done()
+        packet = await asyncio.wait_for(second, 1)
+        assert packet.seq == 2000
+        assert packet.data["code"] == 0
+        handler.cancel_pending(BET_RESP_CMD, 1000)
+
+
+async def test_stale_seq_does_not_resolve_other_request(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        queue = await handler.register_handler(BET_RESP_CMD)
+        # 已逾時請求 (seq=1000) 遲到的回應, 不能交給重試的請求 (seq=2000)
+        retry = handler.expect_response(BET_RESP_CMD, 2000, match={"vid": "BC51"})
+        ws_client.feed(build_frame("bet_resp", seq=1000, code=25, vid="BC51"))
+        await ws_client.drain()
+
+        assert not retry.done()
+        stale = await asyncio.wait_for(queue.get(), 1)
+        assert stale.seq == 1000
+
+        ws_client.feed(build_frame("bet_resp", seq=2000, code=0, vid="BC51"))
+        await ws_client.drain()
+        packet = await asyncio.wait_for(retry, 1)
+        assert packet.data["code"] == 0
+
+
+async def test_zero_seq_response_matches_fields(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        other_table = handler.expect_response(BET_RESP_CMD, 1000, match={"vid": "BC52"})
+        this_table = handler.expect_response(BET_RESP_CMD, 2000, match={"vid": "BC51"})
+        ws_client.feed(build_frame("bet_resp", seq=0, code=0, vid="BC51"))
+        await ws_client.drain()
+
+        packet = await asyncio.wait_for(this_table, 1)
+        assert packet.data["vid"] == "BC51"
+        assert not other_table.done()
+        assert list(handler._pending[BET_RESP_CMD]) == [1000]
+        handler.cancel_pending(BET_RESP_CMD, 1000)
+        assert other_table.cancelled()
+        assert BET_RESP_CMD not in handler._pending
+
+
+async def test_unmatched_zero_seq_response_is_dropped_without_subscribers(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        pending = handler.expect_response(BET_RESP_CMD, 1000, match={"vid": "BC52"})
+        ws_client.feed(build_frame("bet_resp", seq=0, code=0, vid="BC51"))
+        await ws_client.drain()
+
+        assert not pending.done()
+        stats = handler.frame_stats.command(BET_RESP_CMD)
+        assert stats.dropped_no_subscriber == 1
+        assert stats.decodes == 0
+        handler.cancel_pending(BET_RESP_CMD, 1000)
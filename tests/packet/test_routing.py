@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from src.protocols.protocols import PROTOCOLS
+
+pytestmark = pytest.mark.unit
+
+TABLE_STATUS_CMD = PROTOCOLS["table_status"]["cmd"]
+GAME_RESULT_CMD = PROTOCOLS["game_result"]["cmd"]
+GAME_RESULT_JSON = '{"banker": [{"rank": 1, "suit": 2}], "player": [{"rank": 9, "suit": 0}]}'
+
+
+async def test_vid_subscriptions_only_receive_their_table(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        bc51 = await handler.register_handler(TABLE_STATUS_CMD, vid="BC51")
+        bc52 = await handler.register_handler(TABLE_STATUS_CMD, vid="BC52")
+        ws_client.feed(
+            build_frame("table_status", vid="BC52", status=1),
+            build_frame("table_status", vid="BC51", status=2),
+            build_frame("table_status", vid="BC53", status=3),
+        )
+        await ws_client.drain()
+
+        assert bc51.qsize() == 1 and bc52.qsize() == 1
+        assert (await bc51.get()).data["status"] == 2
+        assert (await bc52.get()).data["status"] == 1
+        # 只比對 vid 的訂閱不需要解析協議本體
+        assert handler.frame_stats.command(TABLE_STATUS_CMD).decodes == 2
+
+
+async def test_descriptor_protocol_routes_without_full_decode(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        entry = handler._dispatch[GAME_RESULT_CMD]
+        assert entry.codec is None
+        assert entry.route_decoder is not None
+
+        queue = await handler.register_handler(GAME_RESULT_CMD, vid="BC51")
+        ws_client.feed(
+            build_frame("game_result", vid="BC52", gmtype="BAC", json=GAME_RESULT_JSON),
+            build_frame("game_result", vid="BC51", gmtype="BAC", json=GAME_RESULT_JSON),
+        )
+        await ws_client.drain()
+
+        packet = await asyncio.wait_for(queue.get(), 1)
+        assert queue.empty()
+        assert entry.stats.decodes == 0
+        assert packet.data["vid"] == "BC51"
+        assert entry.stats.decodes == 1
+
+
+async def test_gmcode_and_predicate_filters(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        by_gmcode = await handler.register_handler(TABLE_STATUS_CMD, vid="BC51", gmcode="G2507290000002")
+        betting = await handler.register_handler(TABLE_STATUS_CMD, predicate=lambda data: data.get("status") == 1)
+        ws_client.feed(
+            build_frame("table_status", vid="BC51", gmcode="G2507290000001", status=1),
+            build_frame("table_status", vid="BC51", gmcode="G2507290000002", status=0),
+            build_frame("table_status", vid="BC52", gmcode="G2507290000002", status=1),
+        )
+        await ws_client.drain()
+
+        assert by_gmcode.qsize() == 1
+        assert (await by_gmcode.get()).data["status"] == 0
+        assert [(await betting.get()).data["vid"] for _ in range(betting.qsize())] == ["BC51", "BC52"]
+
+
+async def test_unregistered_subscription_stops_receiving(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        queue = await handler.register_handler(TABLE_STATUS_CMD, vid="BC51")
+        handler.unregister_handler(TABLE_STATUS_CMD, queue)
+        ws_client.feed(build_frame("table_status", vid="BC51", status=1))
+        await ws_client.drain()
+
+        assert queue.empty()
+        assert handler.frame_stats.command(TABLE_STATUS_CMD).dropped_no_subscriber == 1
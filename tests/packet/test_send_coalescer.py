@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from src.packet.send_coalescer import SendCoalescer, disable_send_coalescing, enable_send_coalescing, send_packet
+
+pytestmark = pytest.mark.unit
+
+
+class FakeGateHandler:
+    """記錄每一次送出的 WebSocket 訊息"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, data, description):
+        self.messages.append((bytes(data), description))
+
+
+async def test_packets_within_window_are_sent_as_one_message():
+    gate = FakeGateHandler()
+    coalescer = SendCoalescer(gate.send, window=0.01)
+    await coalescer.send(b"aaaa", "first")
+    await coalescer.send(b"bbbb", "second")
+    assert gate.messages == []
+
+    await asyncio.sleep(0.05)
+    assert gate.messages == [(b"aaaabbbb", "Coalesced 2 packets: first, second")]
+    assert coalescer.stats() == {"messages_sent": 1, "packets_sent": 2, "bytes_sent": 8, "pending_bytes": 0}
+
+
+async def test_reaching_max_bytes_flushes_immediately():
+    gate = FakeGateHandler()
+    coalescer = SendCoalescer(gate.send, window=10, max_bytes=8)
+    await coalescer.send(b"aaaa", "first")
+    assert gate.messages == []
+    await coalescer.send(b"bbbb", "second")
+    assert gate.messages == [(b"aaaabbbb", "Coalesced 2 packets: first, second")]
+    await coalescer.close()
+
+
+async def test_flush_sends_queued_packets_immediately():
+    gate = FakeGateHandler()
+    coalescer = SendCoalescer(gate.send, window=10)
+    await coalescer.send(b"hb", "Heartbeat")
+    await coalescer.send(b"bet", "Bet Request", flush=True)
+    assert gate.messages == [(b"hbbet", "Coalesced 2 packets: Heartbeat, Bet Request")]
+
+    # 單一封包保留原本的描述
+    await coalescer.send(b"bet2", "Bet Request", flush=True)
+    assert gate.messages[-1] == (b"bet2", "Bet Request")
+    await coalescer.close()
+
+
+async def test_close_drains_pending_packets():
+    gate = FakeGateHandler()
+    coalescer = SendCoalescer(gate.send, window=10)
+    await coalescer.send(b"aaaa", "first")
+    await coalescer.close()
+    assert gate.messages == [(b"aaaa", "first")]
+    assert coalescer.stats()["pending_bytes"] == 0
+
+    # 計時器已經取消, 不會再送出空訊息
+    await asyncio.sleep(0)
+    assert len(gate.messages) == 1
+
+
+async def test_send_packet_uses_coalescer_only_when_enabled():
+    gate = FakeGateHandler()
+    await send_packet(gate, b"direct", "Direct")
+    assert gate.messages == [(b"direct", "Direct")]
+
+    enable_send_coalescing(gate, window=10)
+    await send_packet(gate, b"queued", "Queued")
+    assert len(gate.messages) == 1
+
+    await disable_send_coalescing(gate)
+    assert gate.messages[-1] == (b"queued", "Queued")
+    assert gate.send_coalescer is None
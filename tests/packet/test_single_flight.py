@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from src.packet.single_flight import SingleFlight
+
+pytestmark = pytest.mark.unit
+
+
+class FakeRequest:
+    """記錄實際送出的次數, 由測試控制回應的時間與內容"""
+
+    def __init__(self):
+        self.sent = 0
+        self.response = None
+
+    async def __call__(self, flag):
+        self.sent += 1
+        self.response = asyncio.get_running_loop().create_future()
+        return await self.response
+
+
+async def _run_pending():
+    """讓呼叫者與共用的請求 Task 都執行到等待回應"""
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+async def test_concurrent_identical_keys_share_one_call():
+    single_flight = SingleFlight()
+    request = FakeRequest()
+    waiters = [asyncio.ensure_future(single_flight.run(("nocomm", 1), request, 1)) for _ in range(3)]
+    await _run_pending()
+    assert request.sent == 1
+    assert single_flight.stats() == {"calls": 1, "shared_calls": 2, "in_flight": 1}
+
+    request.response.set_result(True)
+    assert await asyncio.gather(*waiters) == [True, True, True]
+    assert single_flight.stats()["in_flight"] == 0
+
+
+async def test_different_keys_are_not_shared():
+    single_flight = SingleFlight()
+    on, off = FakeRequest(), FakeRequest()
+    first = asyncio.ensure_future(single_flight.run(("nocomm", 1), on, 1))
+    second = asyncio.ensure_future(single_flight.run(("nocomm", 0), off, 0))
+    await _run_pending()
+    assert (on.sent, off.sent) == (1, 1)
+
+    on.response.set_result("on")
+    off.response.set_result("off")
+    assert await asyncio.gather(first, second) == ["on", "off"]
+
+
+async def test_cancelling_one_waiter_does_not_cancel_the_shared_call():
+    single_flight = SingleFlight()
+    request = FakeRequest()
+    cancelled = asyncio.ensure_future(single_flight.run(("nocomm", 1), request, 1))
+    waiting = asyncio.ensure_future(single_flight.run(("nocomm", 1), request, 1))
+    await _run_pending()
+
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    assert not request.response.cancelled()
+    assert not waiting.done()
+
+    request.response.set_result(True)
+    assert await waiting is True
+    assert request.sent == 1
+
+
+async def test_key_is_released_after_an_exception():
+    single_flight = SingleFlight()
+    request = FakeRequest()
+    failed = asyncio.ensure_future(single_flight.run(("nocomm", 1), request, 1))
+    await _run_pending()
+    request.response.set_exception(ConnectionError("closed"))
+    with pytest.raises(ConnectionError):
+        await failed
+    assert single_flight.stats()["in_flight"] == 0
+
+    retry = asyncio.ensure_future(single_flight.run(("nocomm", 1), request, 1))
+    await _run_pending()
+    assert request.sent == 2
+    request.response.set_result(True)
+    assert await retry is True
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from src.packet.subscriber_queue import (
+    QUEUE_POLICY_BLOCK,
+    QUEUE_POLICY_CONFLATE,
+    QUEUE_POLICY_DROP_NEWEST,
+    QUEUE_POLICY_DROP_OLDEST,
+    SubscriberQueue,
+    conflate_by_field,
+)
+
+pytestmark = pytest.mark.unit
+
+
+class FakePacket:
+    """只提供 data 的封包, 記錄 data 被存取的次數"""
+
+    def __init__(self, **data):
+        self._data = data
+        self.reads = 0
+
+    @property
+    def data(self):
+        self.reads += 1
+        return self._data
+
+
+def _drain(queue):
+    return [queue.get_nowait() for _ in range(queue.qsize())]
+
+
+async def test_drop_oldest_keeps_newest_packets():
+    queue = SubscriberQueue(maxsize=2, policy=QUEUE_POLICY_DROP_OLDEST)
+    results = [await queue.put(item) for item in (1, 2, 3)]
+    assert results == [0, 0, 1]
+    assert _drain(queue) == [2, 3]
+    assert queue.dropped == 1
+
+
+async def test_drop_newest_keeps_queued_packets():
+    queue = SubscriberQueue(maxsize=2, policy=QUEUE_POLICY_DROP_NEWEST)
+    for item in (1, 2, 3):
+        await queue.put(item)
+    assert _drain(queue) == [1, 2]
+    assert queue.dropped == 1
+
+
+async def test_block_waits_for_reader():
+    queue = SubscriberQueue(maxsize=1, policy=QUEUE_POLICY_BLOCK)
+    await queue.put(1)
+    put_task = asyncio.ensure_future(queue.put(2))
+    await asyncio.sleep(0)
+    assert not put_task.done()
+
+    assert queue.get_nowait() == 1
+    assert await asyncio.wait_for(put_task, 1) == 0
+    assert _drain(queue) == [2]
+    assert queue.dropped == 0
+
+
+async def test_conflate_replaces_packet_with_same_key_in_place():
+    queue = SubscriberQueue(maxsize=10, policy=QUEUE_POLICY_CONFLATE, key=lambda item: item[0])
+    for item in (("BC51", 1), ("BC52", 1), ("BC51", 2), ("BC53", 1), ("BC51", 3)):
+        await queue.put(item)
+    assert _drain(queue) == [("BC51", 3), ("BC52", 1), ("BC53", 1)]
+    assert queue.conflated == 2
+
+    # 取出後相同 key 重新排到佇列最後
+    await queue.put(("BC52", 2))
+    await queue.put(("BC51", 4))
+    assert _drain(queue) == [("BC52", 2), ("BC51", 4)]
+
+
+async def test_conflate_drops_oldest_key_when_full():
+    queue = SubscriberQueue(maxsize=2, policy=QUEUE_POLICY_CONFLATE, key=lambda item: item[0])
+    for item in (("BC51", 1), ("BC52", 1), ("BC53", 1), ("BC51", 2)):
+        await queue.put(item)
+    # 被丟棄的 key 不會留在佇列的位置索引中, 之後的封包重新排入
+    assert _drain(queue) == [("BC53", 1), ("BC51", 2)]
+    assert queue.dropped == 2
+    assert queue.conflated == 0
+
+
+async def test_conflate_computes_key_once_per_packet():
+    queue = SubscriberQueue(maxsize=10, policy=QUEUE_POLICY_CONFLATE, key=conflate_by_field("vid"))
+    packets = [FakePacket(vid=vid) for vid in ("BC51", "BC52", "BC51", "BC53", "BC51")]
+    for packet in packets:
+        await queue.put(packet)
+    assert [packet.reads for packet in packets] == [1, 1, 1, 1, 1]
+    assert _drain(queue) == [packets[4], packets[1], packets[3]]
+
+
+def test_invalid_policy_settings():
+    with pytest.raises(ValueError):
+        SubscriberQueue(policy="unknown")
+    with pytest.raises(ValueError):
+        SubscriberQueue(policy=QUEUE_POLICY_CONFLATE)
+
+
+async def test_get_timeout_leaves_task_uncancelled():
+    queue = SubscriberQueue()
+    with pytest.raises(asyncio.TimeoutError):
+        await queue.get(timeout=0.01)
+    task = asyncio.current_task()
+    if hasattr(task, "cancelling"):
+        assert task.cancelling() == 0
+
+    # 超時的等待者已經移除, 之後放入的封包交給下一次等待
+    waiter = asyncio.ensure_future(queue.get(timeout=1))
+    await asyncio.sleep(0)
+    await queue.put("packet")
+    assert await waiter == "packet"
+    assert queue.empty()
+
+
+async def test_get_timeout_with_multiple_waiters():
+    queue = SubscriberQueue()
+    first = asyncio.ensure_future(queue.get(timeout=1))
+    second = asyncio.ensure_future(queue.get(timeout=0.01))
+    await asyncio.sleep(0.05)
+    assert isinstance(second.exception(), asyncio.TimeoutError)
+
+    await queue.put("packet")
+    assert await asyncio.wait_for(first, 1) == "packet"
+
+
+async def test_get_outside_cancel_propagates():
+    queue = SubscriberQueue()
+    waiter = asyncio.ensure_future(queue.get(timeout=1))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    await queue.put("packet")
+    assert await queue.get(timeout=1) == "packet"
@@ -0,0 +1,48 @@
+import pytest
+
+from src.game.table_state import TableStateCache
+from src.protocols.protocols import PROTOCOLS
+
+pytestmark = pytest.mark.unit
+
+TABLE_STATUS_CMD = PROTOCOLS["table_status"]["cmd"]
+
+
+async def test_cache_does_not_subscribe_until_a_table_is_tracked(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        cache = TableStateCache(handler)
+        ws_client.feed(build_frame("table_status", vid="BC51", gmcode="G2507290000001", status=1))
+        await ws_client.drain()
+
+        assert cache.get("BC51") is None
+        assert handler.frame_stats.command(TABLE_STATUS_CMD).dropped_no_subscriber == 1
+        cache.close()
+
+
+async def test_open_window_requires_an_observed_transition(running_handler, build_frame):
+    async with running_handler() as (handler, ws_client):
+        cache = TableStateCache(handler, betting_window=20, min_remaining=5)
+        cache.track("BC51")
+        # 開始追蹤時已經在投注階段, 不知道剩餘時間
+        ws_client.feed(
+            build_frame("table_status", vid="BC51", gmcode="G2507290000001", status=1),
+            build_frame("table_status", vid="BC52", gmcode="G2507290000001", status=1),
+        )
+        await ws_client.drain()
+        assert cache.get("BC51").betting
+        assert cache.open_window("BC51") is None
+        assert cache.get("BC52") is None
+
+        ws_client.feed(
+            build_frame("stop_bet", vid="BC51", gmcode="G2507290000001"),
+            build_frame("table_status", vid="BC51", gmcode="G2507290000002", status=1),
+        )
+        await ws_client.drain()
+        state = cache.open_window("BC51")
+        assert state is not None
+        assert state.gmcode == "G2507290000002"
+
+        # 剩餘時間不足時等待下一個投注階段
+        state.phase_started_at -= 16
+        assert cache.open_window("BC51") is None
+        cache.close()